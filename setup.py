@@ -9,6 +9,8 @@ import sqlite3
 import sys
 from pathlib import Path
 
+from dotenv import dotenv_values
+
 
 def create_directories():
     """Create necessary directories."""
@@ -28,9 +30,16 @@ def initialize_database():
         return False
     
     try:
+        with open(schema_path, 'r') as f:
+            schema = f.read()
         with sqlite3.connect(db_path) as conn:
-            with open(schema_path, 'r') as f:
-                conn.executescript(f.read())
+            # WAL + relaxed syncing speeds up setup and the app's later writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA mmap_size=268435456")
+            # Run the whole schema in one transaction instead of autocommitting each statement
+            conn.executescript(f"BEGIN;\n{schema}\nCOMMIT;")
         print(f"✓ Database initialized: {db_path}")
         return True
     except Exception as e:
@@ -58,17 +67,17 @@ def check_environment():
         "LANGCHAIN_API_KEY"
     ]
     
-    missing_vars = []
     try:
-        with open(env_file, 'r') as f:
-            env_content = f.read()
-            for var in required_vars:
-                if f"{var}=your_" in env_content or f"{var}=" in env_content and "your_" in env_content:
-                    missing_vars.append(var)
+        env = dotenv_values(env_file)
     except Exception as e:
         print(f"❌ Error reading environment file: {e}")
         return False
     
+    missing_vars = [
+        var for var in required_vars
+        if not env.get(var) or env[var].startswith("your_")
+    ]
+    
     if missing_vars:
         print(f"⚠️  Please configure these API keys in {env_file}:")
         for var in missing_vars:
@@ -99,7 +108,7 @@ def main():
     
     if env_ok:
         print("✅ Setup complete! You can now run:")
-        print("   python src/api/main.py")
+        print("   python -m src.api.main")
         print()
         print("📊 API will be available at:")
         print("   http://localhost:8000")
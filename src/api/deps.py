@@ -0,0 +1,41 @@
+"""
+Shared service instances for the API.
+Route modules and the app use these instead of constructing their own.
+"""
+
+from functools import lru_cache
+from typing import AsyncIterator, Iterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.db.models import db_manager
+from src.observability.tracker import CostTracker
+from src.api.openrouter_client import OpenRouterClient
+
+
+@lru_cache(maxsize=1)
+def get_cost_tracker() -> CostTracker:
+    """Process-wide cost tracker, so run state and usage caches are shared"""
+    return CostTracker()
+
+
+@lru_cache(maxsize=1)
+def get_openrouter_client() -> OpenRouterClient:
+    """Process-wide OpenRouter client with its pooled HTTP connections"""
+    return OpenRouterClient(get_cost_tracker())
+
+
+def get_db() -> Iterator[Session]:
+    """Request-scoped database session, closed even when the request fails"""
+    session = db_manager.get_session()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Request-scoped async session, for routes that query without blocking the loop"""
+    async with db_manager.get_async_session() as session:
+        yield session
@@ -5,26 +5,45 @@ Main application entry point with health checks and basic routing structure.
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 import uvicorn
+import asyncio
+import orjson
+import time
 import logging
+import structlog
 from datetime import datetime
 from typing import Dict, Any
 import os
 from dotenv import load_dotenv
+from sqlalchemy import text
 
 # Import route modules
 from src.api.routes import research, costs, runs
-from src.observability.tracker import CostTracker
 from src.observability.langsmith_integration import langsmith_tracker
-from src.api.openrouter_client import OpenRouterClient
+from src.api.deps import get_cost_tracker, get_openrouter_client
 from src.db.models import db_manager
+from src.config import get_settings
 
-# Load environment variables
-load_dotenv()
+try:
+    from arq import create_pool
+    from arq.connections import RedisSettings
+    ARQ_AVAILABLE = True
+except ImportError:
+    ARQ_AVAILABLE = False
+
+# Load environment variables (once per process, even if this module is
+# imported again under another name, e.g. as __main__ and src.api.main)
+if not os.environ.get("_DOTENV_LOADED"):
+    load_dotenv()
+    os.environ["_DOTENV_LOADED"] = "1"
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+log_level = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+logging.basicConfig(level=log_level)
+# structlog drops calls below log_level before rendering them, so the
+# per-call debug logs on the OpenRouter hot path cost nothing in production
+structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(log_level))
 logger = logging.getLogger(__name__)
 
 # Create FastAPI app
@@ -33,7 +52,8 @@ app = FastAPI(
     description="Multi-agent platform for strategic business research with observability",
     version="0.1.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # CORS configuration
@@ -50,24 +70,67 @@ app.include_router(research.router, prefix="/api")
 app.include_router(costs.router, prefix="/api")
 app.include_router(runs.router, prefix="/api")
 
-# Global instances for health checks
-cost_tracker = CostTracker()
+# Global instances for health checks, shared with the route modules
+cost_tracker = get_cost_tracker()
 openrouter_client = None
 
+# Seconds between background refreshes of the /health snapshot
+HEALTH_REFRESH_INTERVAL = 10.0
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
     global openrouter_client
+    app.state.warmup_task = None
+    app.state.health_snapshot = None
+    app.state.health_task = None
+    app.state.arq_pool = None
+    cost_tracker.batcher.start()
+    redis_url = get_settings().redis_url
+    if redis_url:
+        if not ARQ_AVAILABLE:
+            logger.error("REDIS_URL is set but arq is not installed; running research workflows in-process")
+        else:
+            try:
+                app.state.arq_pool = await create_pool(RedisSettings.from_dsn(redis_url))
+            except Exception as e:
+                logger.error(f"Failed to connect to job queue, running research workflows in-process: {e}")
+    try:
+        await asyncio.to_thread(db_manager.initialize)
+    except Exception as e:
+        logger.error(f"Failed to initialize database: {e}")
+    try:
+        await asyncio.to_thread(db_manager.warm_pool)
+        await db_manager.warm_async_pool()
+    except Exception as e:
+        logger.error(f"Failed to warm database pool: {e}")
     try:
-        openrouter_client = OpenRouterClient(cost_tracker)
+        openrouter_client = get_openrouter_client()
+        # Open the TLS connection, fill the model list cache and load the
+        # tokenizers in the background so the first real request doesn't pay for it
+        app.state.warmup_task = asyncio.create_task(openrouter_client.warmup())
         logger.info("AI Research Platform started successfully")
     except Exception as e:
         logger.error(f"Failed to initialize OpenRouter client: {e}")
+    app.state.health_task = asyncio.create_task(_health_refresher())
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
     try:
+        for task in (app.state.warmup_task, app.state.health_task):
+            if task and not task.done():
+                task.cancel()
+        if openrouter_client:
+            await openrouter_client.aclose()
+        if app.state.arq_pool is not None:
+            await app.state.arq_pool.close()
+        # Apply trace updates still queued for LangSmith
+        await langsmith_tracker.aclose()
+        # Flush queued cost rows before exiting
+        await cost_tracker.batcher.stop()
+        cost_tracker.close()
+        await db_manager.aclose()
         db_manager.close()
         logger.info("AI Research Platform shutdown complete")
     except Exception as e:
@@ -83,50 +146,64 @@ async def root():
         "timestamp": datetime.utcnow().isoformat()
     }
 
-@app.get("/health")
-async def health_check():
-    """Health check endpoint for monitoring."""
+async def _check_database():
+    """Database probe over the async engine so it doesn't block the loop."""
+    try:
+        async with db_manager.get_async_session() as session:
+            await session.execute(text("SELECT 1"))
+        return "database", "ok", False
+    except Exception as e:
+        return "database", f"error: {str(e)}", True
+
+async def _check_langsmith():
+    """LangSmith probe. Never degrades overall status."""
     try:
-        # Perform actual health checks
+        langsmith_healthy = await langsmith_tracker.health_check()
+        return "langsmith", "ok" if langsmith_healthy else "unavailable", False
+    except Exception as e:
+        return "langsmith", f"error: {str(e)}", False
+
+async def _check_openrouter():
+    """OpenRouter probe."""
+    if not openrouter_client:
+        return "openrouter", "not_initialized", True
+    try:
+        openrouter_healthy = await openrouter_client.health_check()
+        return "openrouter", "ok" if openrouter_healthy else "error", False
+    except Exception as e:
+        return "openrouter", f"error: {str(e)}", True
+
+async def _check_budget():
+    """Budget probe."""
+    try:
+        budget_status = await cost_tracker.get_budget_status()
+        if budget_status.can_continue:
+            return "budget", "ok", False
+        return "budget", "budget_exceeded", True
+    except Exception as e:
+        return "budget", f"error: {str(e)}", False
+
+async def _build_health_snapshot():
+    """Run all probes and return (status_code, health_data)."""
+    try:
+        # Run all probes concurrently so latency is bounded by the slowest one
+        results = await asyncio.gather(
+            _check_database(),
+            _check_langsmith(),
+            _check_openrouter(),
+            _check_budget(),
+            return_exceptions=True
+        )
+        
         checks = {}
         overall_status = "healthy"
-        
-        # Database check
-        try:
-            with db_manager.get_session() as session:
-                session.execute("SELECT 1")
-            checks["database"] = "ok"
-        except Exception as e:
-            checks["database"] = f"error: {str(e)}"
-            overall_status = "degraded"
-        
-        # LangSmith check
-        try:
-            langsmith_healthy = await langsmith_tracker.health_check()
-            checks["langsmith"] = "ok" if langsmith_healthy else "unavailable"
-        except Exception as e:
-            checks["langsmith"] = f"error: {str(e)}"
-        
-        # OpenRouter check
-        try:
-            if openrouter_client:
-                openrouter_healthy = await openrouter_client.health_check()
-                checks["openrouter"] = "ok" if openrouter_healthy else "error"
-            else:
-                checks["openrouter"] = "not_initialized"
-                overall_status = "degraded"
-        except Exception as e:
-            checks["openrouter"] = f"error: {str(e)}"
-            overall_status = "degraded"
-        
-        # Budget status
-        try:
-            budget_status = await cost_tracker.get_budget_status()
-            checks["budget"] = "ok" if budget_status.can_continue else "budget_exceeded"
-            if not budget_status.can_continue:
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+            name, status, degraded = result
+            checks[name] = status
+            if degraded:
                 overall_status = "degraded"
-        except Exception as e:
-            checks["budget"] = f"error: {str(e)}"
         
         checks["api"] = "ok"
         
@@ -139,43 +216,73 @@ async def health_check():
         }
         
         status_code = 200 if overall_status == "healthy" else 206 if overall_status == "degraded" else 503
-        
-        return JSONResponse(
-            status_code=status_code,
-            content=health_data
-        )
+        return status_code, health_data
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
-        return JSONResponse(
-            status_code=503,
-            content={
-                "status": "unhealthy",
-                "timestamp": datetime.utcnow().isoformat(),
-                "error": str(e)
-            }
-        )
+        return 503, {
+            "status": "unhealthy",
+            "timestamp": datetime.utcnow().isoformat(),
+            "error": str(e)
+        }
+
+async def _refresh_health_snapshot():
+    """Probe dependencies and store the result on app.state."""
+    status_code, health_data = await _build_health_snapshot()
+    app.state.health_snapshot = (time.monotonic(), status_code, health_data)
+
+async def _health_refresher():
+    """Keep the health snapshot fresh so /health never probes inline."""
+    while True:
+        await _refresh_health_snapshot()
+        await asyncio.sleep(HEALTH_REFRESH_INTERVAL)
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint for monitoring, served from the cached snapshot."""
+    if getattr(app.state, "health_snapshot", None) is None:
+        await _refresh_health_snapshot()
+    
+    refreshed_at, status_code, health_data = app.state.health_snapshot
+    # stale_seconds lets monitors notice a stuck refresher
+    return ORJSONResponse(
+        status_code=status_code,
+        content={**health_data, "stale_seconds": round(time.monotonic() - refreshed_at, 3)}
+    )
+
+# Static placeholder payloads are serialized once and served with a short
+# Cache-Control so dashboard polling doesn't re-encode them on every hit
+_PLACEHOLDER_HEADERS = {"Cache-Control": "public, max-age=5"}
+
+_STATUS_BODY = orjson.dumps({
+    "api_version": "0.1.0",
+    "uptime": "just_started",  # Will implement proper uptime tracking
+    "active_agents": 0,  # Will be populated from database
+    "total_runs": 0,  # Will be populated from database
+    "total_cost": 0.0,  # Will be populated from database
+    "last_activity": None,  # Will be populated from database
+    "system_status": {
+        "database_connected": False,  # Will implement in Phase 1
+        "langsmith_connected": False,  # Will implement in Phase 1
+        "openrouter_available": False  # Will implement in Phase 1
+    }
+})
+_AGENTS_BODY = orjson.dumps({"agents": [], "message": "Agent registry coming in Phase 1"})
+_RUNS_BODY = orjson.dumps({"runs": [], "message": "Run history coming in Phase 1"})
+_COSTS_BODY = orjson.dumps({"total_cost": 0.0, "message": "Cost tracking coming in Phase 1"})
+
+def _placeholder_response(body: bytes) -> Response:
+    """Serve a pre-serialized JSON body with cache headers."""
+    return Response(content=body, media_type="application/json", headers=_PLACEHOLDER_HEADERS)
 
 @app.get("/api/status")
 async def api_status():
     """Detailed API status for dashboard."""
-    return {
-        "api_version": "0.1.0",
-        "uptime": "just_started",  # Will implement proper uptime tracking
-        "active_agents": 0,  # Will be populated from database
-        "total_runs": 0,  # Will be populated from database
-        "total_cost": 0.0,  # Will be populated from database
-        "last_activity": None,  # Will be populated from database
-        "system_status": {
-            "database_connected": False,  # Will implement in Phase 1
-            "langsmith_connected": False,  # Will implement in Phase 1
-            "openrouter_available": False  # Will implement in Phase 1
-        }
-    }
+    return _placeholder_response(_STATUS_BODY)
 
 # Error handlers
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=404,
         content={"error": "Endpoint not found", "path": str(request.url)}
     )
@@ -183,7 +290,7 @@ async def not_found_handler(request, exc):
 @app.exception_handler(500)
 async def internal_error_handler(request, exc):
     logger.error(f"Internal server error: {str(exc)}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={"error": "Internal server error", "message": "Please check logs"}
     )
@@ -192,17 +299,17 @@ async def internal_error_handler(request, exc):
 @app.get("/api/agents")
 async def list_agents():
     """List all available agents - placeholder for Phase 1+."""
-    return {"agents": [], "message": "Agent registry coming in Phase 1"}
+    return _placeholder_response(_AGENTS_BODY)
 
 @app.get("/api/runs")
 async def list_runs():
     """List all research runs - placeholder for Phase 1+."""
-    return {"runs": [], "message": "Run history coming in Phase 1"}
+    return _placeholder_response(_RUNS_BODY)
 
 @app.get("/api/costs")
 async def get_costs():
     """Get cost analytics - placeholder for Phase 1+."""
-    return {"total_cost": 0.0, "message": "Cost tracking coming in Phase 1"}
+    return _placeholder_response(_COSTS_BODY)
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
@@ -210,8 +317,10 @@ if __name__ == "__main__":
     
     logger.info(f"Starting AI Research Platform API on {host}:{port}")
     
+    # Serve the canonical module path so uvicorn (and its reloader) don't
+    # import this file a second time as a separate "main" module
     uvicorn.run(
-        "main:app",
+        "src.api.main:app",
         host=host,
         port=port,
         reload=os.getenv("ENVIRONMENT") == "development",
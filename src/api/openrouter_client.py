@@ -4,18 +4,118 @@ Provides unified interface for multiple LLM providers via OpenRouter.
 """
 
 import httpx
-import json
+import orjson
+import re
 import time
 import asyncio
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, AsyncIterator
 from datetime import datetime
+from dataclasses import dataclass
+from functools import lru_cache
 from pydantic import BaseModel
 from src.config import get_settings
 from src.observability.tracker import CostTracker
 import structlog
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
 
 logger = structlog.get_logger(__name__)
 
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+# Outermost {...} span, used to salvage JSON wrapped in extra text
+_JSON_OBJ_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+# tiktoken encodings by model (None where tiktoken can't serve one), loaded
+# on a worker thread: the first load of an encoding downloads its BPE file
+_encodings: Dict[str, Any] = {}
+
+def _load_encoding(model: str):
+    """tiktoken encoding for a model, or None to fall back to the chars/4 heuristic. Blocking"""
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model.split("/")[-1])
+        except KeyError:
+            # Non-OpenAI models: cl100k_base is a close enough approximation
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning("Failed to load tiktoken encoding", model=model, error=str(e))
+        return None
+
+async def _ensure_encoding(model: str):
+    """Load a model's encoding off the event loop the first time it is needed"""
+    if model not in _encodings:
+        _encodings[model] = await asyncio.to_thread(_load_encoding, model)
+
+def _count_tokens(model: str, text: str) -> int:
+    """Token count for a text, using the model's encoding once it is loaded"""
+    encoding = _encodings.get(model)
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+@lru_cache(maxsize=64)
+def _count_system_tokens(model: str, text: str) -> int:
+    """Token count for a system prompt; the same few are sent with every call"""
+    return _count_tokens(model, text)
+
+def _count_message_tokens(model: str, messages: List[Dict[str, str]]) -> int:
+    """Prompt token count for a list of messages"""
+    return sum(
+        _count_system_tokens(model, msg.get("content", "")) if msg.get("role") == "system"
+        else _count_tokens(model, msg.get("content", ""))
+        for msg in messages
+    )
+
+# Retry policy for transient OpenRouter failures (429, 5xx, timeouts/transport errors)
+RETRY_ATTEMPTS = 3
+RETRY_MAX_WAIT = 4.0
+_backoff = wait_exponential_jitter(initial=0.2, max=RETRY_MAX_WAIT)
+
+def _is_transient(exc: BaseException) -> bool:
+    """Whether a request error is worth retrying on the same model"""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+def _retry_wait(retry_state) -> float:
+    """Honor Retry-After when the provider sends it, otherwise back off with jitter"""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, httpx.HTTPStatusError):
+        retry_after = exc.response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), RETRY_MAX_WAIT)
+            except ValueError:
+                pass
+    return _backoff(retry_state)
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create a pooled HTTP/2 client for OpenRouter, meant to be shared across calls"""
+    return httpx.AsyncClient(
+        base_url=OPENROUTER_BASE_URL,
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        timeout=60.0
+    )
+
+@dataclass(frozen=True, slots=True)
+class ModelSpec:
+    """Per-token pricing for a model, shared read-only across calls"""
+    input_per_token: float
+    output_per_token: float
+    
+    @property
+    def is_free(self) -> bool:
+        return self.input_per_token == 0 and self.output_per_token == 0
+
 class ModelUsage(BaseModel):
     """Usage statistics for a model call"""
     input_tokens: int
@@ -32,7 +132,7 @@ class OpenRouterResponse(BaseModel):
     usage: ModelUsage
     model: str
     finish_reason: str
-    raw_response: Dict[str, Any]
+    raw_response: Dict[str, Any] = {}  # Only populated when call_model(keep_raw=True)
 
 class OpenRouterClient:
     """
@@ -49,6 +149,12 @@ class OpenRouterClient:
         "meta-llama/llama-3.1-8b-instruct:free": {"input": 0.0, "output": 0.0},
     }
     
+    # Per-token specs derived from MODEL_PRICING; also the set of supported models
+    MODELS_TABLE: Dict[str, ModelSpec] = {
+        m: ModelSpec(p["input"] / 1_000_000, p["output"] / 1_000_000)
+        for m, p in MODEL_PRICING.items()
+    }
+    
     # Model selection strategy
     MODELS = {
         "primary": "anthropic/claude-3.5-sonnet",
@@ -58,22 +164,72 @@ class OpenRouterClient:
         "free": "meta-llama/llama-3.1-8b-instruct:free"
     }
     
-    def __init__(self, cost_tracker: Optional[CostTracker] = None):
+    # Cache lifetimes (seconds) for health check and model list lookups
+    HEALTH_CHECK_TTL = 30.0
+    MODELS_LIST_TTL = 300.0
+    
+    def __init__(self,
+                 cost_tracker: Optional[CostTracker] = None,
+                 http_client: Optional[httpx.AsyncClient] = None):
         self.settings = get_settings()
         self.api_key = self.settings.openrouter_api_key
-        self.base_url = "https://openrouter.ai/api/v1"
+        self.base_url = OPENROUTER_BASE_URL
         self.cost_tracker = cost_tracker or CostTracker()
+        self._http = http_client
+        
+        # (monotonic timestamp, value) of the last health check and model list lookups
+        self._health_cache: Optional[tuple] = None
+        self._models_cache: Optional[tuple] = None
         
         if not self.api_key:
             raise ValueError("OpenRouter API key not configured")
     
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Shared HTTP client, created on first use if none was injected"""
+        if self._http is None:
+            self._http = create_http_client()
+        return self._http
+    
+    async def aclose(self):
+        """Close the underlying HTTP client"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+    
+    def _headers(self) -> Dict[str, str]:
+        """Request headers for OpenRouter completion calls"""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": self.settings.app_url or "http://localhost:8000",
+            "X-Title": "AI Research Platform"
+        }
+    
+    async def _check_budget(self, messages: List[Dict[str, str]], max_tokens: int, model: str) -> float:
+        """Return the estimated call cost, raising if the model is unknown or the budget can't cover it"""
+        spec = self.MODELS_TABLE.get(model)
+        if spec is None:
+            raise ValueError(f"Unknown model: {model}")
+        # Loaded before any count for this model, so a cached system prompt
+        # count never comes from the fallback heuristic
+        await _ensure_encoding(model)
+        # Free models can't exceed the budget, so skip the estimate and the lookup
+        if spec.is_free:
+            return 0.0
+        
+        estimated_cost = self._estimate_call_cost(messages, max_tokens, model)
+        if not await self.cost_tracker.can_make_call(estimated_cost):
+            raise ValueError(f"Budget exceeded. Estimated cost: ${estimated_cost:.4f}")
+        return estimated_cost
+    
     async def call_model(self, 
                         messages: List[Dict[str, str]],
                         model: str = None,
                         max_tokens: int = 4000,
                         temperature: float = 0.7,
                         call_type: str = "general",
-                        stream: bool = False) -> OpenRouterResponse:
+                        keep_raw: bool = False) -> OpenRouterResponse:
         """
         Make a call to OpenRouter with automatic cost tracking
         
@@ -83,114 +239,101 @@ class OpenRouterClient:
             max_tokens: Maximum tokens to generate
             temperature: Sampling temperature
             call_type: Type of call for cost tracking
-            stream: Whether to stream the response
+            keep_raw: Keep the decoded response body on raw_response (debugging)
             
         Returns:
             OpenRouterResponse with content and usage statistics
+        
+        Use stream_model() to receive the completion incrementally.
         """
         if model is None:
             model = self.MODELS["primary"]
         
         # Check budget before making call
-        estimated_cost = self._estimate_call_cost(messages, max_tokens, model)
-        if not await self.cost_tracker.can_make_call(estimated_cost):
-            raise ValueError(f"Budget exceeded. Estimated cost: ${estimated_cost:.4f}")
+        estimated_cost = await self._check_budget(messages, max_tokens, model)
         
         start_time = time.time()
         
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": self.settings.app_url or "http://localhost:8000",
-                    "X-Title": "AI Research Platform"
-                }
-                
-                payload = {
-                    "model": model,
-                    "messages": messages,
-                    "max_tokens": max_tokens,
-                    "temperature": temperature,
-                    "stream": stream
-                }
-                
-                logger.info("Making OpenRouter API call", 
-                           model=model, 
-                           call_type=call_type,
-                           estimated_cost=estimated_cost)
-                
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=headers,
-                    json=payload
-                )
-                
-                response.raise_for_status()
-                result = response.json()
-                
-                duration = time.time() - start_time
-                
-                # Extract usage and calculate actual cost
-                usage_data = result.get("usage", {})
-                input_tokens = usage_data.get("prompt_tokens", 0)
-                output_tokens = usage_data.get("completion_tokens", 0)
-                total_tokens = usage_data.get("total_tokens", input_tokens + output_tokens)
-                
-                actual_cost = self._calculate_cost(model, input_tokens, output_tokens)
-                
-                # Create usage object
-                usage = ModelUsage(
-                    input_tokens=input_tokens,
-                    output_tokens=output_tokens,
-                    total_tokens=total_tokens,
-                    cost=actual_cost,
-                    model=model,
-                    timestamp=datetime.utcnow(),
-                    duration_seconds=duration
-                )
-                
-                # Track the cost
-                await self.cost_tracker.track_api_call(
-                    model=model,
-                    input_tokens=input_tokens,
-                    output_tokens=output_tokens,
-                    cost=actual_cost,
-                    call_type=call_type,
-                    duration=duration
-                )
-                
-                # Extract content
-                content = ""
-                if "choices" in result and len(result["choices"]) > 0:
-                    choice = result["choices"][0]
-                    if "message" in choice:
-                        content = choice["message"].get("content", "")
-                    elif "text" in choice:
-                        content = choice["text"]
-                
-                finish_reason = ""
-                if "choices" in result and len(result["choices"]) > 0:
-                    finish_reason = result["choices"][0].get("finish_reason", "")
-                
-                logger.info("OpenRouter API call completed",
-                           model=model,
-                           input_tokens=input_tokens,
-                           output_tokens=output_tokens,
-                           actual_cost=actual_cost,
-                           duration=duration)
-                
-                return OpenRouterResponse(
-                    content=content,
-                    usage=usage,
-                    model=model,
-                    finish_reason=finish_reason,
-                    raw_response=result
-                )
-                
+            headers = self._headers()
+            
+            payload = {
+                "model": model,
+                "messages": messages,
+                "max_tokens": max_tokens,
+                "temperature": temperature
+            }
+            
+            logger.debug("Making OpenRouter API call", 
+                        model=model, 
+                        call_type=call_type,
+                        estimated_cost=estimated_cost)
+            
+            response = await self._post_completion(headers, payload)
+            result = orjson.loads(response.content)
+            
+            duration = time.time() - start_time
+            
+            # Extract usage and calculate actual cost
+            usage_data = result.get("usage", {})
+            input_tokens = usage_data.get("prompt_tokens", 0)
+            output_tokens = usage_data.get("completion_tokens", 0)
+            total_tokens = usage_data.get("total_tokens", input_tokens + output_tokens)
+            
+            actual_cost = self._calculate_cost(model, input_tokens, output_tokens)
+            
+            # Values come straight from the decoded response, so skip re-validation
+            usage = ModelUsage.model_construct(
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                total_tokens=total_tokens,
+                cost=actual_cost,
+                model=model,
+                timestamp=datetime.utcnow(),
+                duration_seconds=duration
+            )
+            
+            # Track the cost
+            await self.cost_tracker.track_api_call(
+                model=model,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                cost=actual_cost,
+                call_type=call_type,
+                duration=duration
+            )
+            
+            # Extract content
+            content = ""
+            if "choices" in result and len(result["choices"]) > 0:
+                choice = result["choices"][0]
+                if "message" in choice:
+                    content = choice["message"].get("content") or ""
+                elif "text" in choice:
+                    content = choice["text"]
+            
+            finish_reason = ""
+            if "choices" in result and len(result["choices"]) > 0:
+                finish_reason = result["choices"][0].get("finish_reason") or ""
+            
+            logger.debug("OpenRouter API call completed",
+                        model=model,
+                        input_tokens=input_tokens,
+                        output_tokens=output_tokens,
+                        actual_cost=actual_cost,
+                        duration=duration)
+            
+            return OpenRouterResponse.model_construct(
+                content=content,
+                usage=usage,
+                model=model,
+                finish_reason=finish_reason,
+                raw_response=result if keep_raw else {}
+            )
+            
         except httpx.HTTPError as e:
             logger.error("OpenRouter API error", error=str(e), model=model)
-            # Try fallback model if primary fails
+            # Retries are exhausted at this point; try fallback model if primary fails
             if model == self.MODELS["primary"] and model != self.MODELS["fallback"]:
                 logger.info("Retrying with fallback model", fallback=self.MODELS["fallback"])
                 return await self.call_model(
@@ -199,67 +342,189 @@ class OpenRouterClient:
                     max_tokens=max_tokens,
                     temperature=temperature,
                     call_type=call_type,
-                    stream=stream
+                    keep_raw=keep_raw
                 )
             raise
         except Exception as e:
             logger.error("Unexpected error in OpenRouter call", error=str(e))
             raise
     
+    @retry(
+        retry=retry_if_exception(_is_transient),
+        stop=stop_after_attempt(RETRY_ATTEMPTS),
+        wait=_retry_wait,
+        reraise=True
+    )
+    async def _post_completion(self, headers: Dict[str, str], payload: Dict[str, Any]) -> httpx.Response:
+        """POST a completion request, retrying transient failures on the same model"""
+        response = await self.http.post("/chat/completions", headers=headers, json=payload)
+        response.raise_for_status()
+        return response
+    
+    async def stream_model(self,
+                          messages: List[Dict[str, str]],
+                          model: str = None,
+                          max_tokens: int = 4000,
+                          temperature: float = 0.7,
+                          call_type: str = "general") -> AsyncIterator[str]:
+        """
+        Stream a completion from OpenRouter, yielding content deltas as they arrive
+        
+        Usage and cost are tracked when the stream ends, including when the
+        consumer stops early or the stream fails partway: OpenRouter bills
+        whatever was generated. If the provider doesn't report usage, token
+        counts are estimated locally.
+        """
+        if model is None:
+            model = self.MODELS["primary"]
+        
+        await self._check_budget(messages, max_tokens, model)
+        
+        start_time = time.time()
+        payload = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": True,
+            "usage": {"include": True}
+        }
+        usage_data: Dict[str, Any] = {}
+        parts: List[str] = []
+        accepted = False
+        
+        try:
+            async with self.http.stream("POST", "/chat/completions", headers=self._headers(), json=payload) as response:
+                response.raise_for_status()
+                accepted = True
+                async for line in response.aiter_lines():
+                    # Skip blank lines and SSE comments (keep-alive pings)
+                    if not line.startswith("data: "):
+                        continue
+                    data = line[6:]
+                    if data == "[DONE]":
+                        break
+                    
+                    chunk = orjson.loads(data)
+                    if chunk.get("usage"):
+                        usage_data = chunk["usage"]
+                    choices = chunk.get("choices")
+                    if choices:
+                        delta = choices[0].get("delta", {}).get("content")
+                        if delta:
+                            parts.append(delta)
+                            yield delta
+        finally:
+            # A rejected request isn't billed; anything past that is
+            if accepted:
+                await self._track_stream(model, messages, usage_data, "".join(parts),
+                                         call_type, time.time() - start_time)
+    
+    async def _track_stream(self, model: str, messages: List[Dict[str, str]],
+                            usage_data: Dict[str, Any], output_text: str,
+                            call_type: str, duration: float):
+        """Record a streamed call's usage, estimating what the provider didn't report"""
+        input_tokens = usage_data.get("prompt_tokens")
+        if input_tokens is None:
+            input_tokens = _count_message_tokens(model, messages)
+        output_tokens = usage_data.get("completion_tokens")
+        if output_tokens is None:
+            output_tokens = _count_tokens(model, output_text)
+        actual_cost = self._calculate_cost(model, input_tokens, output_tokens)
+        
+        await self.cost_tracker.track_api_call(
+            model=model,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cost=actual_cost,
+            call_type=call_type,
+            duration=duration
+        )
+        
+        logger.debug("OpenRouter streaming call completed",
+                    model=model,
+                    input_tokens=input_tokens,
+                    output_tokens=output_tokens,
+                    actual_cost=actual_cost,
+                    duration=duration)
+    
     def _estimate_call_cost(self, messages: List[Dict[str, str]], max_tokens: int, model: str) -> float:
         """Estimate the cost of a call before making it"""
-        # Rough token estimation (4 chars = 1 token)
-        input_chars = sum(len(msg.get("content", "")) for msg in messages)
-        estimated_input_tokens = input_chars // 4
+        estimated_input_tokens = _count_message_tokens(model, messages)
         estimated_output_tokens = max_tokens // 2  # Conservative estimate
         
         return self._calculate_cost(model, estimated_input_tokens, estimated_output_tokens)
     
     def _calculate_cost(self, model: str, input_tokens: int, output_tokens: int) -> float:
         """Calculate cost based on token usage and model pricing"""
-        pricing = self.MODEL_PRICING.get(model, self.MODEL_PRICING["anthropic/claude-3.5-sonnet"])
-        
-        input_cost = (input_tokens / 1_000_000) * pricing["input"]
-        output_cost = (output_tokens / 1_000_000) * pricing["output"]
-        
-        return input_cost + output_cost
+        spec = self.MODELS_TABLE[model]
+        return input_tokens * spec.input_per_token + output_tokens * spec.output_per_token
+    
+    async def warmup(self):
+        """Fill the model list cache and load the configured models' encodings"""
+        await asyncio.gather(
+            self.get_available_models(),
+            *(_ensure_encoding(model) for model in set(self.MODELS.values()))
+        )
     
     async def get_available_models(self) -> List[Dict[str, Any]]:
-        """Get list of available models from OpenRouter"""
+        """Get list of available models from OpenRouter (cached for MODELS_LIST_TTL)"""
+        now = time.monotonic()
+        if self._models_cache and now - self._models_cache[0] < self.MODELS_LIST_TTL:
+            return self._models_cache[1]
+        
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/models",
-                    headers={"Authorization": f"Bearer {self.api_key}"}
-                )
-                response.raise_for_status()
-                return response.json().get("data", [])
+            response = await self.http.get(
+                "/models",
+                headers={"Authorization": f"Bearer {self.api_key}"}
+            )
+            response.raise_for_status()
+            models = orjson.loads(response.content).get("data", [])
+            self._models_cache = (now, models)
+            return models
         except Exception as e:
             logger.error("Failed to fetch available models", error=str(e))
             return []
     
     async def health_check(self) -> bool:
-        """Check if OpenRouter API is accessible"""
+        """Check if OpenRouter API is accessible (cached for HEALTH_CHECK_TTL)"""
+        now = time.monotonic()
+        if self._health_cache and now - self._health_cache[0] < self.HEALTH_CHECK_TTL:
+            return self._health_cache[1]
+        
         try:
-            test_messages = [{"role": "user", "content": "Hello"}]
-            response = await self.call_model(
-                messages=test_messages,
-                model=self.MODELS["free"],  # Use free model for health check
-                max_tokens=10,
-                call_type="health_check"
+            # Key lookup rather than a completion: it checks reachability and
+            # the API key without billing a call or writing a cost row, so the
+            # background /health refresher can run it indefinitely
+            response = await self.http.get(
+                "/auth/key",
+                headers={"Authorization": f"Bearer {self.api_key}"}
             )
-            return bool(response.content)
+            healthy = response.status_code == 200
         except Exception as e:
             logger.error("OpenRouter health check failed", error=str(e))
-            return False
+            healthy = False
+        
+        self._health_cache = (now, healthy)
+        return healthy
 
 # Convenience functions for common use cases
+_default_client: Optional[OpenRouterClient] = None
+
+def _get_default_client() -> OpenRouterClient:
+    """Lazily construct the client shared by the convenience functions"""
+    global _default_client
+    if _default_client is None:
+        _default_client = OpenRouterClient()
+    return _default_client
+
 async def quick_call(prompt: str, 
                     model: str = None, 
                     system_message: str = None,
-                    call_type: str = "quick_call") -> str:
+                    call_type: str = "quick_call",
+                    client: Optional[OpenRouterClient] = None) -> str:
     """Make a quick call with a simple prompt"""
-    client = OpenRouterClient()
+    client = client or _get_default_client()
     
     messages = []
     if system_message:
@@ -272,29 +537,29 @@ async def quick_call(prompt: str,
 async def structured_call(prompt: str,
                          expected_schema: Dict[str, Any],
                          model: str = None,
-                         call_type: str = "structured_call") -> Dict[str, Any]:
+                         call_type: str = "structured_call",
+                         client: Optional[OpenRouterClient] = None) -> Dict[str, Any]:
     """Make a call expecting structured JSON output"""
     system_message = f"""
     You are a helpful assistant that always responds with valid JSON.
     Your response must follow this exact schema:
-    {json.dumps(expected_schema, indent=2)}
+    {orjson.dumps(expected_schema, option=orjson.OPT_INDENT_2).decode()}
     
     Return ONLY valid JSON, no additional text or formatting.
     """
     
-    content = await quick_call(prompt, model, system_message, call_type)
+    content = await quick_call(prompt, model, system_message, call_type, client=client)
     
     try:
-        return json.loads(content)
-    except json.JSONDecodeError as e:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError as e:
         logger.error("Failed to parse JSON response", content=content, error=str(e))
         # Try to extract JSON from the response
-        import re
-        json_match = re.search(r'\{.*\}', content, re.DOTALL)
+        json_match = _JSON_OBJ_RE.search(content)
         if json_match:
             try:
-                return json.loads(json_match.group())
-            except json.JSONDecodeError:
+                return orjson.loads(json_match.group())
+            except orjson.JSONDecodeError:
                 pass
         
         raise ValueError(f"Invalid JSON response: {content}")
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""
+Keyset pagination shared by the list routes.
+Lists are ordered newest first by (timestamp, id); the last row of a full
+page is the cursor for the next one.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Response
+from sqlalchemy import tuple_
+
+# Response headers carrying the next page's cursor, set only when the page
+# came back full (a short page is the last one)
+NEXT_BEFORE_TS_HEADER = "X-Next-Before-Ts"
+NEXT_BEFORE_ID_HEADER = "X-Next-Before-Id"
+
+
+def before_cursor(ts_column, id_column, before_ts: datetime, before_id: Optional[Any]):
+    """
+    Filter for rows after the cursor in (timestamp desc, id desc) order.
+    With an id, rows sharing the cursor's timestamp aren't skipped
+    """
+    if before_id is None:
+        return ts_column < before_ts
+    return tuple_(ts_column, id_column) < tuple_(before_ts, before_id)
+
+
+def next_cursor(rows, limit: int, ts_key: str = "timestamp") -> Optional[Dict[str, Any]]:
+    """The cursor after a page of rows (mappings), or None on the last page"""
+    if len(rows) < limit:
+        return None
+    last = rows[-1]
+    return {"before_ts": last[ts_key], "before_id": last["id"]}
+
+
+def set_next_cursor(response: Response, cursor: Optional[Dict[str, Any]]):
+    """Expose the next page's cursor in the response headers"""
+    if cursor is None:
+        return
+    response.headers[NEXT_BEFORE_TS_HEADER] = cursor["before_ts"].isoformat()
+    response.headers[NEXT_BEFORE_ID_HEADER] = str(cursor["before_id"])
@@ -3,13 +3,19 @@ Cost tracking and budget management API routes.
 """
 
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Dict, List, Optional, Any
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy import exists, func, select
 from sqlalchemy.orm import Session
+import orjson
 
 from src.db.models import db_manager, CostTracking, ResearchRun, CostTrackingResponse
 from src.observability.tracker import CostTracker, BudgetStatus, BudgetConfig
+from src.api.deps import get_cost_tracker, get_db
+from src.api.pagination import before_cursor, next_cursor, set_next_cursor
 import structlog
 
 logger = structlog.get_logger(__name__)
@@ -43,13 +49,8 @@ class BudgetStatusResponse(BaseModel):
     warnings: List[str]
     recommendations: List[str]
 
-# Dependency to get database session
-def get_db():
-    with db_manager.get_session() as session:
-        yield session
-
-# Global cost tracker instance
-cost_tracker = CostTracker()
+# Shared cost tracker instance
+cost_tracker = get_cost_tracker()
 
 @router.get("/status", response_model=BudgetStatusResponse)
 async def get_budget_status():
@@ -89,13 +90,20 @@ async def get_cost_breakdown(days: int = Query(30, ge=1, le=365)):
         daily_usage=breakdown["daily_usage"]
     )
 
+# Columns returned by /tracking, selected as plain rows instead of ORM objects
+_TRACKING_COLUMNS = [getattr(CostTracking, field) for field in CostTrackingResponse.model_fields]
+
 @router.get("/tracking", response_model=List[CostTrackingResponse])
 async def get_cost_tracking(
+    response: Response,
     run_id: Optional[str] = None,
     model: Optional[str] = None,
     call_type: Optional[str] = None,
     days: int = Query(7, ge=1, le=365),
     limit: int = Query(100, ge=1, le=1000),
+    before_ts: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    stream: bool = False,
     db: Session = Depends(get_db)
 ):
     """
@@ -103,30 +111,58 @@ async def get_cost_tracking(
     
     Args:
         run_id: Filter by specific run ID
-        model: Filter by model name
+        model: Filter by model name prefix, case-insensitive (e.g. "openai/")
         call_type: Filter by call type
         days: Number of days to look back
         limit: Maximum number of entries to return
+        before_ts: Only return entries older than this timestamp
+        before_id: With before_ts, the id of the previous page's last entry,
+            so entries sharing its timestamp aren't skipped. A full page
+            returns the next cursor in the X-Next-Before-Ts and
+            X-Next-Before-Id headers
+        stream: Stream entries as NDJSON while they are fetched (no cursor
+            headers; use the last streamed entry)
     """
     # Calculate date threshold
     since_date = datetime.utcnow() - timedelta(days=days)
     
     # Build query
-    query = db.query(CostTracking).filter(CostTracking.timestamp >= since_date)
+    stmt = select(*_TRACKING_COLUMNS).where(CostTracking.timestamp >= since_date)
+    
+    if before_ts:
+        stmt = stmt.where(before_cursor(CostTracking.timestamp, CostTracking.id, before_ts, before_id))
     
     if run_id:
-        query = query.filter(CostTracking.run_id == run_id)
+        stmt = stmt.where(CostTracking.run_id == run_id)
     
     if model:
-        query = query.filter(CostTracking.model_name.ilike(f"%{model}%"))
+        # Anchored LIKE (case-insensitive in SQLite) can use the NOCASE index;
+        # a leading wildcard or ILIKE's lower() wrapping can't. Wildcards in
+        # the filter itself are escaped so it stays a plain prefix match
+        prefix = model.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        stmt = stmt.where(CostTracking.model_name.like(f"{prefix}%", escape="\\"))
     
     if call_type:
-        query = query.filter(CostTracking.call_type == call_type)
+        stmt = stmt.where(CostTracking.call_type == call_type)
     
     # Order by timestamp descending and limit
-    cost_entries = query.order_by(CostTracking.timestamp.desc()).limit(limit).all()
+    stmt = stmt.order_by(CostTracking.timestamp.desc(), CostTracking.id.desc()).limit(limit)
     
-    return [CostTrackingResponse.from_orm(entry) for entry in cost_entries]
+    if stream:
+        return StreamingResponse(_stream_rows(stmt), media_type="application/x-ndjson")
+    
+    rows = db.execute(stmt).mappings().all()
+    set_next_cursor(response, next_cursor(rows, limit))
+    return rows
+
+def _stream_rows(stmt):
+    """
+    Yield one NDJSON line per row, fetching in batches. The stream owns its
+    session so it isn't closed by dependency teardown mid-response.
+    """
+    with db_manager.get_session() as session:
+        for row in session.execute(stmt.execution_options(yield_per=100)).mappings():
+            yield orjson.dumps(dict(row)) + b"\n"
 
 @router.get("/run/{run_id}")
 async def get_run_costs(run_id: str, db: Session = Depends(get_db)):
@@ -134,14 +170,21 @@ async def get_run_costs(run_id: str, db: Session = Depends(get_db)):
     Get cost breakdown for a specific research run.
     """
     # Check if run exists
-    run = db.query(ResearchRun).filter_by(id=run_id).first()
-    if not run:
+    if not db.query(exists().where(ResearchRun.id == run_id)).scalar():
         raise HTTPException(status_code=404, detail="Research run not found")
     
-    # Get cost entries for this run
-    cost_entries = db.query(CostTracking).filter_by(run_id=run_id).all()
+    return run_cost_summary(db, run_id)
+
+def run_cost_summary(db: Session, run_id: str) -> Dict[str, Any]:
+    """Cost totals, per-model and per-call-type rollups and timeline for a run"""
+    # Totals, per-model and per-call-type rollups are aggregated in SQL
+    total_cost, total_tokens, api_calls = db.query(
+        func.coalesce(func.sum(CostTracking.cost), 0.0),
+        func.coalesce(func.sum(CostTracking.total_tokens), 0),
+        func.count(CostTracking.id)
+    ).filter(CostTracking.run_id == run_id).one()
     
-    if not cost_entries:
+    if not api_calls:
         return {
             "run_id": run_id,
             "total_cost": 0.0,
@@ -152,51 +195,34 @@ async def get_run_costs(run_id: str, db: Session = Depends(get_db)):
             "timeline": []
         }
     
-    # Calculate totals
-    total_cost = sum(entry.cost for entry in cost_entries)
-    total_tokens = sum(entry.total_tokens for entry in cost_entries)
-    api_calls = len(cost_entries)
+    by_model = [
+        {"model": model, "cost": cost, "tokens": tokens, "calls": calls}
+        for model, cost, tokens, calls in _group_run_costs(db, run_id, CostTracking.model_name)
+    ]
     
-    # Group by model
-    by_model = {}
-    for entry in cost_entries:
-        model = entry.model_name
-        if model not in by_model:
-            by_model[model] = {
-                "model": model,
-                "cost": 0.0,
-                "tokens": 0,
-                "calls": 0
-            }
-        by_model[model]["cost"] += entry.cost
-        by_model[model]["tokens"] += entry.total_tokens
-        by_model[model]["calls"] += 1
+    by_call_type = [
+        {"call_type": call_type, "cost": cost, "tokens": tokens, "calls": calls}
+        for call_type, cost, tokens, calls in _group_run_costs(db, run_id, CostTracking.call_type)
+    ]
     
-    # Group by call type
-    by_call_type = {}
-    for entry in cost_entries:
-        call_type = entry.call_type
-        if call_type not in by_call_type:
-            by_call_type[call_type] = {
-                "call_type": call_type,
-                "cost": 0.0,
-                "tokens": 0,
-                "calls": 0
-            }
-        by_call_type[call_type]["cost"] += entry.cost
-        by_call_type[call_type]["tokens"] += entry.total_tokens
-        by_call_type[call_type]["calls"] += 1
+    # Create timeline from plain column tuples rather than ORM objects
+    timeline_rows = db.query(
+        CostTracking.timestamp,
+        CostTracking.cost,
+        CostTracking.model_name,
+        CostTracking.call_type,
+        CostTracking.total_tokens
+    ).filter(CostTracking.run_id == run_id).order_by(CostTracking.timestamp.asc()).all()
     
-    # Create timeline
     timeline = [
         {
-            "timestamp": entry.timestamp.isoformat(),
-            "cost": entry.cost,
-            "model": entry.model_name,
-            "call_type": entry.call_type,
-            "tokens": entry.total_tokens
+            "timestamp": timestamp.isoformat(),
+            "cost": cost,
+            "model": model,
+            "call_type": call_type,
+            "tokens": tokens
         }
-        for entry in sorted(cost_entries, key=lambda x: x.timestamp)
+        for timestamp, cost, model, call_type, tokens in timeline_rows
     ]
     
     return {
@@ -204,11 +230,20 @@ async def get_run_costs(run_id: str, db: Session = Depends(get_db)):
         "total_cost": total_cost,
         "total_tokens": total_tokens,
         "api_calls": api_calls,
-        "by_model": list(by_model.values()),
-        "by_call_type": list(by_call_type.values()),
+        "by_model": by_model,
+        "by_call_type": by_call_type,
         "timeline": timeline
     }
 
+def _group_run_costs(db: Session, run_id: str, column):
+    """(key, cost, tokens, calls) rows for a run's cost entries grouped by column"""
+    return db.query(
+        column,
+        func.sum(CostTracking.cost),
+        func.sum(CostTracking.total_tokens),
+        func.count(CostTracking.id)
+    ).filter(CostTracking.run_id == run_id).group_by(column).all()
+
 @router.post("/budget")
 async def update_budget_config(config: BudgetConfigRequest):
     """
@@ -262,31 +297,30 @@ async def update_budget_config(config: BudgetConfigRequest):
         logger.error("Failed to update budget configuration", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/models")
-async def get_model_costs():
-    """
-    Get current model pricing information.
-    """
+_MODEL_DESCRIPTIONS = {
+    "primary": "High-quality analysis and reasoning",
+    "fallback": "Cost-effective backup option",
+    "web_search": "Online research and fact-checking",
+    "cost_effective": "Budget-friendly for simple tasks",
+    "free": "No-cost option for testing"
+}
+
+@lru_cache(maxsize=1)
+def _model_costs_payload() -> Dict[str, Any]:
+    """/models response, built once since the pricing tables are static"""
     from src.api.openrouter_client import OpenRouterClient
     
     pricing = OpenRouterClient.MODEL_PRICING
-    models = OpenRouterClient.MODELS
     
     model_info = []
-    for model_key, model_name in models.items():
+    for model_key, model_name in OpenRouterClient.MODELS.items():
         price_info = pricing.get(model_name, {"input": 0.0, "output": 0.0})
         model_info.append({
             "model_key": model_key,
             "model_name": model_name,
             "input_cost_per_1m_tokens": price_info["input"],
             "output_cost_per_1m_tokens": price_info["output"],
-            "description": {
-                "primary": "High-quality analysis and reasoning",
-                "fallback": "Cost-effective backup option",
-                "web_search": "Online research and fact-checking",
-                "cost_effective": "Budget-friendly for simple tasks",
-                "free": "No-cost option for testing"
-            }.get(model_key, "General purpose model")
+            "description": _MODEL_DESCRIPTIONS.get(model_key, "General purpose model")
         })
     
     return {
@@ -294,6 +328,13 @@ async def get_model_costs():
         "pricing_note": "Costs are per 1 million tokens. Actual costs depend on prompt and response length."
     }
 
+@router.get("/models")
+async def get_model_costs():
+    """
+    Get current model pricing information.
+    """
+    return _model_costs_payload()
+
 @router.get("/alerts")
 async def get_budget_alerts():
     """
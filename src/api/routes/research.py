@@ -4,21 +4,29 @@ Research API routes for managing research runs and workflows.
 
 import uuid
 import asyncio
+import contextlib
 from datetime import datetime
 from typing import Dict, List, Optional, Any
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import distinct, func
+from sqlalchemy.orm import Session, joinedload
 
 from src.db.models import (
     db_manager, ResearchRun, Agent, FrameworkResult,
-    ResearchRunCreate, ResearchRunResponse, FrameworkResultResponse
+    ResearchRunCreate, ResearchRunResponse, FrameworkResultResponse, refresh_run_stats
 )
 from src.observability.tracker import CostTracker, BudgetStatus
 from src.observability.langsmith_integration import langsmith_tracker
-from src.api.openrouter_client import OpenRouterClient
+from src.api.deps import get_cost_tracker, get_db
+from src.api.routes.runs import invalidate_runs_cache
 import structlog
 
+try:
+    from arq.jobs import Job
+except ImportError:
+    Job = None  # Only needed when the arq queue is configured
+
 logger = structlog.get_logger(__name__)
 
 router = APIRouter(prefix="/research", tags=["research"])
@@ -47,41 +55,63 @@ class ResearchResultsResponse(BaseModel):
     duration_seconds: Optional[float]
     summary: Optional[Dict[str, Any]] = None
 
-# Dependency to get database session
-def get_db():
-    with db_manager.get_session() as session:
-        yield session
+# Framework analyses in workflow order
+FRAMEWORK_ORDER = ["porters", "pestel", "swot", "ansoff", "vpc"]
+
+# Framework analyses run at once per workflow, to respect OpenRouter rate limits
+FRAMEWORK_CONCURRENCY = 3
 
-# Global instances
-cost_tracker = CostTracker()
-openrouter_client = OpenRouterClient(cost_tracker)
+# In-process workflow tasks by run_id, so cancel_research_run can stop them
+_active_tasks: Dict[str, asyncio.Task] = {}
+
+# Shared cost tracker instance
+cost_tracker = get_cost_tracker()
 
 @router.post("/run", response_model=ResearchStatusResponse)
 async def start_research_run(
     request: StartResearchRequest,
     background_tasks: BackgroundTasks,
+    http_request: Request,
     db: Session = Depends(get_db)
 ):
     """
     Start a new research run with specified components and configuration.
     """
+    arq_pool = getattr(http_request.app.state, "arq_pool", None)
+    return await launch_research_run(request, background_tasks, arq_pool, db)
+
+async def launch_research_run(
+    request: StartResearchRequest,
+    background_tasks: BackgroundTasks,
+    arq_pool,
+    db: Session
+) -> ResearchStatusResponse:
+    """
+    Create a research run and hand its workflow to the arq worker, or to the
+    caller's background tasks when no queue is configured.
+    Shared by the start and retry routes.
+    """
     # Validate components
     if not request.components:
         raise HTTPException(status_code=400, detail="At least one component must be specified")
     
-    # Check budget before starting
-    budget_status = await cost_tracker.get_budget_status()
+    # Generate run ID
+    run_id = str(uuid.uuid4())
+    
+    # Check budget and start cost tracking for this run in one step. Cost
+    # tracking state is per process, so a queued run is only checked here
+    # (against the same limits) and the worker starts tracking it when it
+    # picks the job up
+    if arq_pool is not None:
+        budget_status, started = await cost_tracker.check_run_budget(run_id)
+    else:
+        budget_status, started = await cost_tracker.check_and_start_run(run_id)
     if not budget_status.can_continue:
         raise HTTPException(
             status_code=402, 
             detail=f"Budget constraints prevent starting new run: {', '.join(budget_status.warnings)}"
         )
-    
-    # Generate run ID
-    run_id = str(uuid.uuid4())
-    
-    # Check if we can start this run
-    if not await cost_tracker.start_run(run_id):
+    if not started:
         raise HTTPException(
             status_code=402,
             detail="Cannot start run due to budget constraints"
@@ -111,16 +141,23 @@ async def start_research_run(
     )
     
     db.add(run)
+    refresh_run_stats(db, run)
     db.commit()
     db.refresh(run)
+    invalidate_runs_cache()
     
     logger.info("Research run created", 
                run_id=run_id, 
                components=request.components,
                budget_remaining=budget_status.monthly_remaining)
     
-    # Start research workflow in background
-    background_tasks.add_task(execute_research_workflow, run_id, request, db_manager)
+    # Hand the workflow to the arq worker when a queue is configured (the
+    # run_id doubles as job id so a run is never queued twice); otherwise
+    # run it in this process
+    if arq_pool is not None:
+        await arq_pool.enqueue_job("workflow_job", run_id, request.model_dump(), _job_id=run_id)
+    else:
+        background_tasks.add_task(execute_research_workflow, run_id, request, db_manager)
     
     return ResearchStatusResponse(
         run_id=run_id,
@@ -138,7 +175,10 @@ async def get_research_status(run_id: str, db: Session = Depends(get_db)):
     """
     Get the current status of a research run.
     """
-    run = db.query(ResearchRun).filter_by(id=run_id).first()
+    # Load the run and its completed framework types in one round trip
+    run = db.query(ResearchRun).options(
+        joinedload(ResearchRun.framework_results).load_only(FrameworkResult.framework_type)
+    ).filter_by(id=run_id).first()
     if not run:
         raise HTTPException(status_code=404, detail="Research run not found")
     
@@ -146,9 +186,10 @@ async def get_research_status(run_id: str, db: Session = Depends(get_db)):
     budget_status = await cost_tracker.get_budget_status()
     
     # Calculate progress based on completed frameworks
-    completed_frameworks = db.query(FrameworkResult).filter_by(run_id=run_id).count()
-    total_frameworks = 5  # Porter's, PESTEL, SWOT, Ansoff, VPC
-    progress_percentage = (completed_frameworks / total_frameworks) * 100 if completed_frameworks > 0 else 0
+    completed = {result.framework_type for result in run.framework_results}
+    completed_frameworks = len(completed)
+    total_frameworks = len(FRAMEWORK_ORDER)
+    progress_percentage = (completed_frameworks / total_frameworks) * 100
     
     progress = {
         "completed_frameworks": completed_frameworks,
@@ -156,23 +197,16 @@ async def get_research_status(run_id: str, db: Session = Depends(get_db)):
         "percentage": progress_percentage
     }
     
-    # Determine current step
+    # Determine current step from which frameworks are done, not how many
     current_step = "unknown"
     if run.status == "pending":
         current_step = "initialization"
     elif run.status == "running":
-        if completed_frameworks == 0:
+        if not completed:
             current_step = "competitor_discovery"
-        elif completed_frameworks == 1:
-            current_step = "pestel_analysis"
-        elif completed_frameworks == 2:
-            current_step = "swot_analysis"
-        elif completed_frameworks == 3:
-            current_step = "ansoff_analysis"
-        elif completed_frameworks == 4:
-            current_step = "vpc_analysis"
         else:
-            current_step = "generating_reports"
+            next_framework = next((f for f in FRAMEWORK_ORDER if f not in completed), None)
+            current_step = f"{next_framework}_analysis" if next_framework else "generating_reports"
     
     return ResearchStatusResponse(
         run_id=run_id,
@@ -199,30 +233,36 @@ async def get_research_results(run_id: str, db: Session = Depends(get_db)):
     if run.status not in ["completed", "failed"]:
         raise HTTPException(status_code=400, detail="Research run not yet completed")
     
-    # Get framework results
+    # Get framework results and their summary totals in one pass
     framework_results = db.query(FrameworkResult).filter_by(run_id=run_id).all()
-    framework_responses = [
-        FrameworkResultResponse.from_orm(result) for result in framework_results
-    ]
+    total_confidence = 0.0
+    total_citations = 0
+    components = set()
+    for result in framework_results:
+        total_confidence += result.confidence_score or 0
+        total_citations += result.citation_count or 0
+        if result.component:
+            components.add(result.component)
     
     # Generate summary
     summary = None
     if run.status == "completed" and framework_results:
         summary = {
             "total_frameworks": len(framework_results),
-            "avg_confidence": sum(r.confidence_score or 0 for r in framework_results) / len(framework_results),
-            "total_citations": sum(r.citation_count for r in framework_results),
-            "components_analyzed": list(set(r.component for r in framework_results if r.component))
+            "avg_confidence": total_confidence / len(framework_results),
+            "total_citations": total_citations,
+            "components_analyzed": list(components)
         }
     
-    return ResearchResultsResponse(
-        run_id=run_id,
-        status=run.status,
-        frameworks=framework_responses,
-        total_cost=run.total_cost or 0.0,
-        duration_seconds=run.duration_seconds,
-        summary=summary
-    )
+    # The response model reads the ORM results from attributes while serializing
+    return {
+        "run_id": run_id,
+        "status": run.status,
+        "frameworks": framework_results,
+        "total_cost": run.total_cost or 0.0,
+        "duration_seconds": run.duration_seconds,
+        "summary": summary
+    }
 
 @router.get("/runs", response_model=List[ResearchRunResponse])
 async def list_research_runs(
@@ -233,16 +273,31 @@ async def list_research_runs(
     """
     List recent research runs with optional status filtering.
     """
-    query = db.query(ResearchRun).order_by(ResearchRun.created_at.desc())
+    # Completed framework counts per run, joined in so clients don't need
+    # a follow-up status call per run
+    completed_sub = db.query(
+        FrameworkResult.run_id,
+        func.count(distinct(FrameworkResult.framework_type)).label("completed")
+    ).group_by(FrameworkResult.run_id).subquery()
+    
+    query = db.query(
+        ResearchRun, func.coalesce(completed_sub.c.completed, 0)
+    ).outerjoin(
+        completed_sub, ResearchRun.id == completed_sub.c.run_id
+    ).order_by(ResearchRun.created_at.desc())
     
     if status:
         query = query.filter(ResearchRun.status == status)
     
-    runs = query.limit(limit).all()
-    return [ResearchRunResponse.from_orm(run) for run in runs]
+    responses = []
+    for run, completed_frameworks in query.limit(limit).all():
+        response = ResearchRunResponse.model_validate(run)
+        response.completed_frameworks = completed_frameworks
+        responses.append(response)
+    return responses
 
 @router.delete("/run/{run_id}")
-async def cancel_research_run(run_id: str, db: Session = Depends(get_db)):
+async def cancel_research_run(run_id: str, http_request: Request, db: Session = Depends(get_db)):
     """
     Cancel a running research run.
     """
@@ -259,7 +314,20 @@ async def cancel_research_run(run_id: str, db: Session = Depends(get_db)):
     if run.start_time:
         run.duration_seconds = (run.end_time - run.start_time).total_seconds()
     
+    refresh_run_stats(db, run)
     db.commit()
+    invalidate_runs_cache()
+    
+    # Stop the workflow so it doesn't keep spending budget: in-process runs
+    # are cancelled directly, queued ones are aborted through arq
+    task = _active_tasks.pop(run_id, None)
+    arq_pool = getattr(http_request.app.state, "arq_pool", None)
+    if task is not None:
+        task.cancel()
+    elif arq_pool is not None:
+        # abort() flags the job, then polls for its result; don't wait on that
+        with contextlib.suppress(asyncio.TimeoutError):
+            await Job(run_id, arq_pool).abort(timeout=0, poll_delay=0.1)
     
     logger.info("Research run cancelled", run_id=run_id)
     
@@ -310,61 +378,107 @@ async def list_available_frameworks():
     
     return {"frameworks": frameworks}
 
+async def run_framework(framework: str,
+                        run_id: str,
+                        request: StartResearchRequest,
+                        semaphore: asyncio.Semaphore) -> FrameworkResult:
+    """
+    Run a single framework analysis and return its (unsaved) result.
+    Results are stored together by execute_research_workflow.
+    """
+    async with semaphore:
+        await asyncio.sleep(3)  # Simulate analysis time
+        
+        # Create mock framework result
+        result = FrameworkResult(
+            run_id=run_id,
+            framework_type=framework,
+            component=request.components[0] if request.components else "general",
+            results={"mock": f"results for {framework}"},
+            confidence_score=0.8,
+            quality_score=0.85,
+            citation_count=5,
+            tokens_used=1000,
+            api_calls_count=3,
+            cost=0.15,
+            duration_seconds=3.0
+        )
+    
+    logger.debug("Framework analysis completed", framework=framework)
+    return result
+
 # Background task for executing research workflow
 async def execute_research_workflow(run_id: str, request: StartResearchRequest, db_manager):
     """
     Execute the research workflow in the background.
+    The workflow runs in its own task, registered in _active_tasks so
+    cancel_research_run can stop it.
+    """
+    task = asyncio.create_task(_run_research_workflow(run_id, request, db_manager))
+    _active_tasks[run_id] = task
+    try:
+        await task
+    except asyncio.CancelledError:
+        # Propagate only if we were cancelled ourselves (e.g. worker abort),
+        # not when the run was cancelled through the API
+        if asyncio.current_task().cancelling():
+            raise
+    finally:
+        _active_tasks.pop(run_id, None)
+
+async def _run_research_workflow(run_id: str, request: StartResearchRequest, db_manager):
+    """
+    Research workflow body.
     This is a simplified version - Phase 2 will implement the full workflow.
     """
-    logger.info("Starting research workflow execution", run_id=run_id)
+    # Every log line from this task and its framework tasks carries the run id
+    structlog.contextvars.bind_contextvars(run_id=run_id)
+    logger.info("Starting research workflow execution")
     
     with db_manager.get_session() as db:
         run = db.query(ResearchRun).filter_by(id=run_id).first()
         if not run:
-            logger.error("Run not found", run_id=run_id)
+            logger.error("Run not found")
+            return
+        
+        if run.status == "cancelled":
+            logger.info("Research run cancelled before it started")
+            await cost_tracker.end_run()
             return
         
         try:
             # Update status to running
             run.status = "running"
+            refresh_run_stats(db, run)
             db.commit()
             
             # Simulate research workflow execution
             # This will be replaced with actual workflow in Phase 2
-            logger.info("Simulating research workflow", run_id=run_id)
+            logger.info("Simulating research workflow")
             
             # Simulate competitor discovery
             await asyncio.sleep(2)
-            logger.info("Competitor discovery completed", run_id=run_id)
+            logger.info("Competitor discovery completed")
+            
+            # Run the framework analyses concurrently
+            semaphore = asyncio.Semaphore(FRAMEWORK_CONCURRENCY)
+            outcomes = await asyncio.gather(
+                *[run_framework(framework, run_id, request, semaphore) for framework in FRAMEWORK_ORDER],
+                return_exceptions=True
+            )
+            
+            # Store the completed results and the run cost in a single commit
+            results = [r for r in outcomes if not isinstance(r, BaseException)]
+            db.add_all(results)
+            run.total_cost = (run.total_cost or 0.0) + sum(r.cost for r in results)
+            failures = [e for e in outcomes if isinstance(e, BaseException)]
+            if failures:
+                raise failures[0]
             
-            # Simulate framework analyses
-            frameworks = ["porters", "pestel", "swot", "ansoff", "vpc"]
-            for i, framework in enumerate(frameworks):
-                await asyncio.sleep(3)  # Simulate analysis time
-                
-                # Create mock framework result
-                result = FrameworkResult(
-                    run_id=run_id,
-                    framework_type=framework,
-                    component=request.components[0] if request.components else "general",
-                    results={"mock": f"results for {framework}"},
-                    confidence_score=0.8,
-                    quality_score=0.85,
-                    citation_count=5,
-                    tokens_used=1000,
-                    api_calls_count=3,
-                    cost=0.15,
-                    duration_seconds=3.0
-                )
-                db.add(result)
-                
-                # Update run cost
-                run.total_cost = (run.total_cost or 0.0) + 0.15
-                
-                logger.info("Framework analysis completed", 
-                           framework=framework, 
-                           run_id=run_id,
-                           progress=f"{i+1}/{len(frameworks)}")
+            # End cost tracking first: it writes the run's queued cost rows,
+            # so they are in place before anything sees the finished status
+            # (and run details cache finished runs for good)
+            cost_summary = await cost_tracker.end_run()
             
             # Complete the run
             run.status = "completed"
@@ -372,16 +486,31 @@ async def execute_research_workflow(run_id: str, request: StartResearchRequest,
             if run.start_time:
                 run.duration_seconds = (run.end_time - run.start_time).total_seconds()
             
+            refresh_run_stats(db, run)
             db.commit()
+            logger.info("Research workflow completed", cost_summary=cost_summary)
             
-            # End cost tracking
-            cost_summary = await cost_tracker.end_run()
-            logger.info("Research workflow completed", 
-                       run_id=run_id,
-                       cost_summary=cost_summary)
+        except asyncio.CancelledError:
+            logger.info("Research workflow cancelled")
+            
+            # Stop charging this run, then persist the cancellation
+            await cost_tracker.end_run()
+            
+            run.status = "cancelled"
+            run.end_time = datetime.utcnow()
+            if run.start_time:
+                run.duration_seconds = (run.end_time - run.start_time).total_seconds()
+            
+            refresh_run_stats(db, run)
+            db.commit()
+            raise
             
         except Exception as e:
-            logger.error("Research workflow failed", run_id=run_id, error=str(e))
+            logger.error("Research workflow failed", error=str(e))
+            
+            # End cost tracking before the failure is visible, as above
+            if cost_tracker.current_run_id == run_id:
+                await cost_tracker.end_run()
             
             # Update run with error
             run.status = "failed"
@@ -390,7 +519,5 @@ async def execute_research_workflow(run_id: str, request: StartResearchRequest,
             if run.start_time:
                 run.duration_seconds = (run.end_time - run.start_time).total_seconds()
             
-            db.commit()
-            
-            # End cost tracking
-            await cost_tracker.end_run()
\ No newline at end of file
+            refresh_run_stats(db, run)
+            db.commit()
\ No newline at end of file
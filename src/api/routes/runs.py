@@ -2,23 +2,97 @@
 Research run management API routes.
 """
 
+import time
+from collections import OrderedDict, defaultdict
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
-from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Dict, List, Optional, Any, Tuple
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Query, Request, Response
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, raiseload, selectinload
+from sqlalchemy import bindparam, func, desc, lambda_stmt, select
 
 from src.db.models import (
-    db_manager, ResearchRun, Agent, FrameworkResult, ActivityLog,
+    ResearchRun, Agent, FrameworkResult, ActivityLog, RunStatsDaily,
     ResearchRunResponse, FrameworkResultResponse, AgentResponse
 )
+from src.api.deps import get_async_db, get_db
+from src.api.pagination import before_cursor, next_cursor, set_next_cursor
+from src.api.routes.costs import run_cost_summary
+from src.config import RESEARCH_FRAMEWORKS, VALID_FRAMEWORK_TYPES
 import structlog
 
 logger = structlog.get_logger(__name__)
 
 router = APIRouter(prefix="/runs", tags=["runs"])
 
+# Dashboard aggregates change slowly; serve repeat hits from memory.
+# Keyed by (endpoint, window), values are (monotonic timestamp, response)
+RUNS_CACHE_TTL = 30.0
+_response_cache: Dict[Tuple[str, int], Tuple[float, Any]] = {}
+
+def _cached_response(key: Tuple[str, int]) -> Optional[Any]:
+    entry = _response_cache.get(key)
+    if entry and time.monotonic() - entry[0] < RUNS_CACHE_TTL:
+        return entry[1]
+    return None
+
+def _store_response(key: Tuple[str, int], value: Any) -> Any:
+    _response_cache[key] = (time.monotonic(), value)
+    return value
+
+def invalidate_runs_cache():
+    """Drop cached dashboard aggregates after run state changes"""
+    _response_cache.clear()
+
+# Details of finished runs never change, so they are kept until evicted
+# (least recently used first) rather than expiring
+FINISHED_STATUSES = frozenset({"completed", "failed"})
+RUN_DETAILS_CACHE_SIZE = 1024
+_run_details_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+# Rows listed per page by /recent
+RECENT_RUNS_LIMIT = 20
+RECENT_LOGS_LIMIT = 50
+
+# The agent registry is a handful of rarely changing rows:
+# (monotonic timestamp, agents) of the last listing
+AGENTS_CACHE_TTL = 300.0
+_agents_cache: Optional[Tuple[float, List[Agent]]] = None
+
+# Fixed-shape statements, built once with their parameters bound per call.
+# lambda_stmt also caches the statement's cache key, so repeat requests go
+# straight to the compiled SQL
+_STATUS_TOTALS_STMT = lambda_stmt(lambda: select(
+    RunStatsDaily.status,
+    func.sum(RunStatsDaily.count).label("n"),
+    func.sum(RunStatsDaily.timed_count).label("timed"),
+    func.sum(RunStatsDaily.total_duration).label("dur"),
+    func.sum(RunStatsDaily.timed_cost).label("cost")
+).where(RunStatsDaily.day >= bindparam("since_day")).group_by(RunStatsDaily.status))
+
+_RUN_DETAILS_STMT = lambda_stmt(lambda: select(ResearchRun).options(
+    joinedload(ResearchRun.agent),
+    selectinload(ResearchRun.framework_results),
+    selectinload(ResearchRun.activity_logs),
+    raiseload("*")
+).where(ResearchRun.id == bindparam("run_id")))
+
+_RUN_EXISTS_STMT = lambda_stmt(lambda: select(ResearchRun.id).where(ResearchRun.id == bindparam("run_id")))
+
+_FRAMEWORK_RESULTS_STMT = lambda_stmt(lambda: select(FrameworkResult).where(
+    FrameworkResult.run_id == bindparam("run_id"),
+    FrameworkResult.framework_type == bindparam("framework_type")
+))
+
+_RUNS_BY_STATUS_STMT = lambda_stmt(lambda: select(
+    ResearchRun.status, func.count(ResearchRun.id)
+).where(ResearchRun.created_at >= bindparam("since")).group_by(ResearchRun.status))
+
+_LOGS_BY_LEVEL_STMT = lambda_stmt(lambda: select(
+    ActivityLog.level, func.count(ActivityLog.id)
+).where(ActivityLog.timestamp >= bindparam("since")).group_by(ActivityLog.level))
+
 # Response models
 class RunStatisticsResponse(BaseModel):
     total_runs: int
@@ -50,15 +124,10 @@ class ActivityLogResponse(BaseModel):
     class Config:
         from_attributes = True
 
-# Dependency to get database session
-def get_db():
-    with db_manager.get_session() as session:
-        yield session
-
 @router.get("/statistics", response_model=RunStatisticsResponse)
 async def get_run_statistics(
     days: int = Query(30, ge=1, le=365),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get statistics about research runs over the specified time period.
@@ -66,48 +135,39 @@ async def get_run_statistics(
     Args:
         days: Number of days to include in statistics (1-365)
     """
-    since_date = datetime.utcnow() - timedelta(days=days)
-    
-    # Basic counts
-    total_runs = db.query(ResearchRun).filter(ResearchRun.created_at >= since_date).count()
-    successful_runs = db.query(ResearchRun).filter(
-        ResearchRun.created_at >= since_date,
-        ResearchRun.status == "completed"
-    ).count()
-    failed_runs = db.query(ResearchRun).filter(
-        ResearchRun.created_at >= since_date,
-        ResearchRun.status == "failed"
-    ).count()
-    pending_runs = db.query(ResearchRun).filter(
-        ResearchRun.created_at >= since_date,
-        ResearchRun.status == "pending"
-    ).count()
-    running_runs = db.query(ResearchRun).filter(
-        ResearchRun.created_at >= since_date,
-        ResearchRun.status == "running"
-    ).count()
-    
-    # Duration and cost statistics
-    completed_runs = db.query(ResearchRun).filter(
-        ResearchRun.created_at >= since_date,
-        ResearchRun.status == "completed",
-        ResearchRun.duration_seconds.isnot(None)
-    ).all()
+    cached = _cached_response(("statistics", days))
+    if cached is not None:
+        return cached
+    
+    since_day = (datetime.utcnow() - timedelta(days=days)).date()
+    
+    # Per-status counts and completed-run totals from the daily rollup, which
+    # the research routes keep current as runs change status
+    rows = (await db.execute(_STATUS_TOTALS_STMT, {"since_day": since_day})).all()
     
+    by_status = {row.status: row for row in rows}
+    counts = defaultdict(int, {row.status: row.n for row in rows})
+    total_runs = sum(counts.values())
+    successful_runs = counts["completed"]
+    failed_runs = counts["failed"]
+    pending_runs = counts["pending"]
+    running_runs = counts["running"]
+    
+    # Duration and cost statistics over completed runs with a recorded duration
     avg_duration_minutes = 0.0
     avg_cost_per_run = 0.0
     total_cost = 0.0
     
-    if completed_runs:
-        total_duration = sum(run.duration_seconds or 0 for run in completed_runs)
-        avg_duration_minutes = (total_duration / len(completed_runs)) / 60  # Convert to minutes
+    completed = by_status.get("completed")
+    if completed and completed.timed:
+        avg_duration_minutes = (completed.dur / completed.timed) / 60  # Convert to minutes
         
-        total_cost = sum(run.total_cost or 0 for run in completed_runs)
-        avg_cost_per_run = total_cost / len(completed_runs)
+        total_cost = float(completed.cost)
+        avg_cost_per_run = total_cost / completed.timed
     
     success_rate = successful_runs / total_runs if total_runs > 0 else 0.0
     
-    return RunStatisticsResponse(
+    return _store_response(("statistics", days), RunStatisticsResponse(
         total_runs=total_runs,
         successful_runs=successful_runs,
         failed_runs=failed_runs,
@@ -117,28 +177,29 @@ async def get_run_statistics(
         avg_cost_per_run=avg_cost_per_run,
         total_cost=total_cost,
         success_rate=success_rate
-    )
+    ))
 
 @router.get("/{run_id}/details", response_model=RunDetailsResponse)
-async def get_run_details(run_id: str, db: Session = Depends(get_db)):
+async def get_run_details(run_id: str, db: AsyncSession = Depends(get_async_db)):
     """
     Get comprehensive details for a specific research run.
     """
-    # Get the run
-    run = db.query(ResearchRun).filter_by(id=run_id).first()
+    cached = _run_details_cache.get(run_id)
+    if cached is not None:
+        _run_details_cache.move_to_end(run_id)
+        return cached
+    
+    # Get the run with its agent, framework results and logs in three queries
+    run = (await db.execute(_RUN_DETAILS_STMT, {"run_id": run_id})).scalar_one_or_none()
     if not run:
         raise HTTPException(status_code=404, detail="Research run not found")
     
-    # Get the agent
-    agent = db.query(Agent).filter_by(id=run.agent_id).first()
+    agent = run.agent
     if not agent:
         raise HTTPException(status_code=500, detail="Associated agent not found")
     
-    # Get framework results
-    framework_results = db.query(FrameworkResult).filter_by(run_id=run_id).all()
-    
-    # Get activity logs
-    activity_logs_raw = db.query(ActivityLog).filter_by(run_id=run_id).order_by(ActivityLog.timestamp).all()
+    framework_results = run.framework_results
+    activity_logs_raw = sorted(run.activity_logs, key=lambda log: log.timestamp)
     activity_logs = [
         {
             "id": log.id,
@@ -152,26 +213,29 @@ async def get_run_details(run_id: str, db: Session = Depends(get_db)):
         for log in activity_logs_raw
     ]
     
-    # Get cost summary from cost tracking
-    from src.api.routes.costs import get_run_costs
-    try:
-        cost_summary = await get_run_costs(run_id, db)
-    except:
-        cost_summary = {"total_cost": run.total_cost or 0.0}
-    
-    return RunDetailsResponse(
-        run=ResearchRunResponse.from_orm(run),
-        agent=AgentResponse.from_orm(agent),
-        frameworks=[FrameworkResultResponse.from_orm(result) for result in framework_results],
-        activity_logs=activity_logs,
-        cost_summary=cost_summary
-    )
+    # Get cost summary from cost tracking, in this request's session
+    cost_summary = await db.run_sync(run_cost_summary, run_id)
+    
+    # Serialized here, while the session is open, so a cached entry holds
+    # plain data rather than ORM objects detached from a closed session
+    details = RunDetailsResponse.model_validate({
+        "run": run,
+        "agent": agent,
+        "frameworks": framework_results,
+        "activity_logs": activity_logs,
+        "cost_summary": cost_summary
+    }, from_attributes=True).model_dump()
+    if run.status in FINISHED_STATUSES:
+        _run_details_cache[run_id] = details
+        if len(_run_details_cache) > RUN_DETAILS_CACHE_SIZE:
+            _run_details_cache.popitem(last=False)
+    return details
 
 @router.get("/{run_id}/frameworks/{framework_type}")
 async def get_framework_results(
     run_id: str, 
     framework_type: str, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get detailed results for a specific framework analysis.
@@ -181,18 +245,16 @@ async def get_framework_results(
         framework_type: Framework type (porters, pestel, swot, ansoff, vpc)
     """
     # Validate framework type
-    valid_frameworks = ["porters", "pestel", "swot", "ansoff", "vpc"]
-    if framework_type not in valid_frameworks:
+    if framework_type not in VALID_FRAMEWORK_TYPES:
         raise HTTPException(
             status_code=400, 
-            detail=f"Invalid framework type. Must be one of: {', '.join(valid_frameworks)}"
+            detail=f"Invalid framework type. Must be one of: {', '.join(RESEARCH_FRAMEWORKS)}"
         )
     
     # Get framework results
-    results = db.query(FrameworkResult).filter_by(
-        run_id=run_id,
-        framework_type=framework_type
-    ).all()
+    results = (await db.execute(
+        _FRAMEWORK_RESULTS_STMT, {"run_id": run_id, "framework_type": framework_type}
+    )).scalars().all()
     
     if not results:
         raise HTTPException(
@@ -225,10 +287,13 @@ async def get_framework_results(
 @router.get("/{run_id}/logs", response_model=List[ActivityLogResponse])
 async def get_run_logs(
     run_id: str,
+    response: Response,
     level: Optional[str] = Query(None, description="Filter by log level"),
-    component: Optional[str] = Query(None, description="Filter by component"),
+    component: Optional[str] = Query(None, description="Filter by exact component name"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of logs"),
-    db: Session = Depends(get_db)
+    before_ts: Optional[datetime] = Query(None, description="Only logs older than this timestamp"),
+    before_id: Optional[int] = Query(None, description="With before_ts, id of the previous page's last log"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get activity logs for a specific research run.
@@ -236,30 +301,49 @@ async def get_run_logs(
     Args:
         run_id: Research run ID
         level: Filter by log level (info, warning, error, debug)
-        component: Filter by component name
+        component: Filter by exact component name
         limit: Maximum number of logs to return
+        before_ts: Only return logs older than this timestamp
+        before_id: With before_ts, the id of the previous page's last log, so
+            logs sharing its timestamp aren't skipped. A full page returns
+            the next cursor in the X-Next-Before-Ts and X-Next-Before-Id headers
     """
     # Check if run exists
-    run = db.query(ResearchRun).filter_by(id=run_id).first()
+    run = (await db.execute(_RUN_EXISTS_STMT, {"run_id": run_id})).first()
     if not run:
         raise HTTPException(status_code=404, detail="Research run not found")
     
-    # Build query
-    query = db.query(ActivityLog).filter_by(run_id=run_id)
+    # Build query over the returned columns only (skips the details JSON)
+    query = select(
+        ActivityLog.id, ActivityLog.run_id, ActivityLog.level, ActivityLog.message,
+        ActivityLog.component, ActivityLog.action, ActivityLog.timestamp
+    ).where(ActivityLog.run_id == run_id)
     
     if level:
-        query = query.filter(ActivityLog.level == level)
+        query = query.where(ActivityLog.level == level)
     
     if component:
-        query = query.filter(ActivityLog.component.ilike(f"%{component}%"))
+        # Exact match, so (run_id, component, timestamp) serves the filter,
+        # ordering and limit straight from the index
+        query = query.where(ActivityLog.component == component)
+    
+    if before_ts:
+        query = query.where(before_cursor(ActivityLog.timestamp, ActivityLog.id, before_ts, before_id))
     
     # Order by timestamp descending and limit
-    logs = query.order_by(desc(ActivityLog.timestamp)).limit(limit).all()
+    query = query.order_by(desc(ActivityLog.timestamp), desc(ActivityLog.id)).limit(limit)
+    logs = (await db.execute(query)).mappings().all()
     
-    return [ActivityLogResponse.from_orm(log) for log in logs]
+    set_next_cursor(response, next_cursor(logs, limit))
+    return logs
 
 @router.post("/{run_id}/retry")
-async def retry_failed_run(run_id: str, db: Session = Depends(get_db)):
+async def retry_failed_run(
+    run_id: str,
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    db: Session = Depends(get_db)
+):
     """
     Retry a failed research run by creating a new run with the same parameters.
     """
@@ -272,11 +356,7 @@ async def retry_failed_run(run_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Can only retry failed runs")
     
     # Create new run with same parameters
-    import uuid
-    from src.api.routes.research import StartResearchRequest, start_research_run
-    from fastapi import BackgroundTasks
-    
-    new_run_id = str(uuid.uuid4())
+    from src.api.routes.research import StartResearchRequest, launch_research_run
     
     # Extract original parameters
     input_data = original_run.input_data or {}
@@ -287,9 +367,9 @@ async def retry_failed_run(run_id: str, db: Session = Depends(get_db)):
         config=input_data.get("config")
     )
     
-    # Start new run
-    background_tasks = BackgroundTasks()
-    response = await start_research_run(retry_request, background_tasks, db)
+    # Start new run; its workflow runs on this request's background tasks
+    arq_pool = getattr(http_request.app.state, "arq_pool", None)
+    response = await launch_research_run(retry_request, background_tasks, arq_pool, db)
     
     logger.info("Retrying failed run", 
                original_run_id=run_id, 
@@ -303,74 +383,96 @@ async def retry_failed_run(run_id: str, db: Session = Depends(get_db)):
     }
 
 @router.get("/agents", response_model=List[AgentResponse])
-async def list_agents(db: Session = Depends(get_db)):
+async def list_agents(db: AsyncSession = Depends(get_async_db)):
     """
     List all available agents in the system.
     """
-    agents = db.query(Agent).order_by(Agent.created_at.desc()).all()
-    return [AgentResponse.from_orm(agent) for agent in agents]
+    global _agents_cache
+    if _agents_cache and time.monotonic() - _agents_cache[0] < AGENTS_CACHE_TTL:
+        return _agents_cache[1]
+    
+    agents = (await db.execute(
+        select(Agent).options(raiseload("*")).order_by(Agent.created_at.desc())
+    )).scalars().all()
+    _agents_cache = (time.monotonic(), agents)
+    return agents
 
 @router.get("/recent")
 async def get_recent_activity(
     hours: int = Query(24, ge=1, le=168, description="Hours to look back (1-168)"),
-    db: Session = Depends(get_db)
+    runs_before_ts: Optional[datetime] = Query(None, description="Only list runs created before this timestamp"),
+    runs_before_id: Optional[str] = Query(None, description="With runs_before_ts, id of the previous page's last run"),
+    logs_before_ts: Optional[datetime] = Query(None, description="Only list logs older than this timestamp"),
+    logs_before_id: Optional[int] = Query(None, description="With logs_before_ts, id of the previous page's last log"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get recent activity summary across all runs.
     
     Args:
         hours: Number of hours to look back (1-168, max 1 week)
+        runs_before_ts, runs_before_id: Cursor paging back through the runs
+            list, taken from the previous response's next_cursors["runs"]
+        logs_before_ts, logs_before_id: Cursor for the logs list, paged
+            independently of the runs, from next_cursors["logs"]
+    
+    The summary always covers the whole window.
     """
+    first_page = runs_before_ts is None and logs_before_ts is None
+    
+    # Only the first page is cached
+    if first_page:
+        cached = _cached_response(("recent", hours))
+        if cached is not None:
+            return cached
+    
     since_time = datetime.utcnow() - timedelta(hours=hours)
     
-    # Get recent runs
-    recent_runs = db.query(ResearchRun).filter(
-        ResearchRun.created_at >= since_time
-    ).order_by(desc(ResearchRun.created_at)).limit(20).all()
+    # Get recent runs (only the listed columns, not the JSON payloads)
+    runs_query = select(
+        ResearchRun.id, ResearchRun.name, ResearchRun.status,
+        ResearchRun.created_at, ResearchRun.total_cost
+    ).where(ResearchRun.created_at >= since_time)
+    if runs_before_ts:
+        runs_query = runs_query.where(
+            before_cursor(ResearchRun.created_at, ResearchRun.id, runs_before_ts, runs_before_id)
+        )
+    recent_runs = (await db.execute(
+        runs_query.order_by(desc(ResearchRun.created_at), desc(ResearchRun.id)).limit(RECENT_RUNS_LIMIT)
+    )).mappings().all()
     
     # Get recent logs
-    recent_logs = db.query(ActivityLog).filter(
-        ActivityLog.timestamp >= since_time
-    ).order_by(desc(ActivityLog.timestamp)).limit(50).all()
-    
-    # Summary statistics
-    runs_by_status = {}
-    for run in recent_runs:
-        status = run.status
-        runs_by_status[status] = runs_by_status.get(status, 0) + 1
+    logs_query = select(
+        ActivityLog.id, ActivityLog.run_id, ActivityLog.level,
+        ActivityLog.message, ActivityLog.component, ActivityLog.timestamp
+    ).where(ActivityLog.timestamp >= since_time)
+    if logs_before_ts:
+        logs_query = logs_query.where(
+            before_cursor(ActivityLog.timestamp, ActivityLog.id, logs_before_ts, logs_before_id)
+        )
+    recent_logs = (await db.execute(
+        logs_query.order_by(desc(ActivityLog.timestamp), desc(ActivityLog.id)).limit(RECENT_LOGS_LIMIT)
+    )).mappings().all()
     
-    logs_by_level = {}
-    for log in recent_logs:
-        level = log.level
-        logs_by_level[level] = logs_by_level.get(level, 0) + 1
+    # Summary statistics over the whole window, not just the listed rows
+    runs_by_status = dict((await db.execute(_RUNS_BY_STATUS_STMT, {"since": since_time})).all())
+    logs_by_level = dict((await db.execute(_LOGS_BY_LEVEL_STMT, {"since": since_time})).all())
     
-    return {
+    response = {
         "period_hours": hours,
-        "recent_runs": [
-            {
-                "id": run.id,
-                "name": run.name,
-                "status": run.status,
-                "created_at": run.created_at,
-                "total_cost": run.total_cost
-            }
-            for run in recent_runs
-        ],
-        "recent_logs": [
-            {
-                "id": log.id,
-                "run_id": log.run_id,
-                "level": log.level,
-                "message": log.message,
-                "component": log.component,
-                "timestamp": log.timestamp
-            }
-            for log in recent_logs
-        ],
+        "recent_runs": [dict(run) for run in recent_runs],
+        "recent_logs": [dict(log) for log in recent_logs],
+        "next_cursors": {
+            "runs": next_cursor(recent_runs, RECENT_RUNS_LIMIT, ts_key="created_at"),
+            "logs": next_cursor(recent_logs, RECENT_LOGS_LIMIT)
+        },
         "summary": {
-            "total_runs": len(recent_runs),
+            "total_runs": sum(runs_by_status.values()),
             "runs_by_status": runs_by_status,
-            "total_logs": len(recent_logs),
+            "total_logs": sum(logs_by_level.values()),
             "logs_by_level": logs_by_level
         }
-    }
\ No newline at end of file
+    }
+    if first_page:
+        _store_response(("recent", hours), response)
+    return response
@@ -0,0 +1,87 @@
+"""
+arq worker for research workflows.
+Run with: arq src.api.worker.WorkerSettings
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict
+
+import structlog
+from arq.connections import RedisSettings
+
+from src.config import get_settings
+from src.db.models import db_manager, ResearchRun, refresh_run_stats
+from src.observability.langsmith_integration import langsmith_tracker
+from src.api.deps import get_cost_tracker
+from src.api.routes.research import StartResearchRequest, execute_research_workflow
+
+# Same level filtering as the API process, so suppressed calls are dropped
+# before any rendering
+log_level = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(log_level))
+logger = structlog.get_logger(__name__)
+
+# This process's cost tracker; runs are started and ended on it by the jobs
+cost_tracker = get_cost_tracker()
+
+
+async def startup(ctx: Dict[str, Any]):
+    """Make sure tables and default data exist before taking jobs"""
+    cost_tracker.batcher.start()
+    await asyncio.to_thread(db_manager.initialize)
+
+
+async def shutdown(ctx: Dict[str, Any]):
+    """Apply trace updates still queued for LangSmith and flush queued cost rows"""
+    await langsmith_tracker.aclose()
+    await cost_tracker.batcher.stop()
+    cost_tracker.close()
+
+
+def _fail_run(run_id: str, error: str):
+    """Mark a queued run failed before its workflow started"""
+    with db_manager.get_session() as db:
+        run = db.get(ResearchRun, run_id)
+        if run is None or run.status != "pending":
+            return
+        run.status = "failed"
+        run.error_message = error
+        run.end_time = datetime.utcnow()
+        if run.start_time:
+            run.duration_seconds = (run.end_time - run.start_time).total_seconds()
+        refresh_run_stats(db, run)
+        db.commit()
+
+
+async def workflow_job(ctx: Dict[str, Any], run_id: str, request_data: Dict[str, Any]):
+    """
+    Execute a queued research workflow. The API process only checked the
+    budget when queueing it, so the run's cost tracking starts here
+    """
+    if not await cost_tracker.start_run(run_id):
+        logger.warning("Queued research run refused by budget", run_id=run_id)
+        await asyncio.to_thread(_fail_run, run_id, "Budget constraints prevent starting this run")
+        return
+    
+    try:
+        await execute_research_workflow(run_id, StartResearchRequest(**request_data), db_manager)
+    finally:
+        # The workflow ends the run on every path past loading it; this
+        # covers the early returns before that
+        if cost_tracker.current_run_id == run_id:
+            await cost_tracker.end_run()
+
+
+class WorkerSettings:
+    """arq worker configuration"""
+    functions = [workflow_job]
+    on_startup = startup
+    on_shutdown = shutdown
+    redis_settings = RedisSettings.from_dsn(get_settings().redis_url or "redis://localhost:6379")
+    # Research workflows run for minutes; don't let arq kill them at the 5 minute default
+    job_timeout = 3600
+    # Lets cancel_research_run abort queued and running jobs
+    allow_abort_jobs = True
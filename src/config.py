@@ -6,6 +6,7 @@ Centralized configuration using Pydantic Settings
 from pydantic_settings import BaseSettings
 from pydantic import Field
 from typing import Optional, List, Dict, Any
+from functools import lru_cache
 import os
 
 
@@ -17,10 +18,14 @@ class Settings(BaseSettings):
     host: str = Field(default="0.0.0.0", description="Host to bind the application")
     port: int = Field(default=8000, description="Port to bind the application")
     debug: bool = Field(default=True, description="Debug mode")
+    app_url: Optional[str] = Field(default=None, description="Public app URL, sent as HTTP-Referer to OpenRouter")
     
     # Database
     database_url: str = Field(default="sqlite:///./ai_research_platform.db", description="Database connection URL")
     
+    # Job queue
+    redis_url: Optional[str] = Field(default=None, description="Redis URL for the arq worker queue; research runs in-process when unset")
+    
     # API Keys
     openrouter_api_key: Optional[str] = Field(default=None, description="OpenRouter API key for LLM access")
     openrouter_base_url: str = Field(default="https://openrouter.ai/api/v1", description="OpenRouter base URL")
@@ -34,6 +39,7 @@ class Settings(BaseSettings):
     langchain_endpoint: str = Field(default="https://api.smith.langchain.com", description="LangSmith endpoint")
     langchain_api_key: Optional[str] = Field(default=None, description="LangSmith API key")
     langchain_project: str = Field(default="ai-research-platform", description="LangSmith project name")
+    langsmith_sample_rate: float = Field(default=1.0, ge=0.0, le=1.0, description="Fraction of performance and custom metric updates sent to LangSmith")
     
     # Cost Control
     api_budget_soft_cap: float = Field(default=50.0, description="Soft budget cap in USD")
@@ -74,14 +80,10 @@ class Settings(BaseSettings):
 
 
 # Global settings instance
-_settings = None
-
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
-    """Get global settings instance"""
-    global _settings
-    if _settings is None:
-        _settings = Settings()
-    return _settings
+    """Get global settings instance (parsed once, then cached)"""
+    return Settings()
 
 
 # Model cost mapping (USD per 1K tokens)
@@ -137,6 +139,8 @@ RESEARCH_FRAMEWORKS = {
     }
 }
 
+VALID_FRAMEWORK_TYPES: frozenset = frozenset(RESEARCH_FRAMEWORKS)
+
 # Trusted source weighting
 SOURCE_WEIGHTS = {
     "academic": 1.0,
@@ -3,12 +3,15 @@ Database models for AI research platform using SQLAlchemy ORM.
 Provides structured access to research data with relationships.
 """
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, Float, ForeignKey, JSON, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, Session
-from sqlalchemy import create_engine
+from sqlalchemy.orm import relationship, Session, sessionmaker
+from sqlalchemy import case, create_engine, delete, event, func, insert, select, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+import asyncio
 from pydantic import BaseModel
 import json
 
@@ -55,6 +58,12 @@ class ResearchRun(Base):
     framework_results = relationship("FrameworkResult", back_populates="run")
     cost_entries = relationship("CostTracking", back_populates="run")
     activity_logs = relationship("ActivityLog", back_populates="run")
+    
+    # Status counts over a created_at window and newest-first listings
+    __table_args__ = (
+        Index("idx_research_runs_status_created_at", "status", "created_at"),
+        Index("idx_research_runs_created_at", "created_at"),
+    )
 
 class FrameworkResult(Base):
     """Framework analysis results"""
@@ -76,6 +85,11 @@ class FrameworkResult(Base):
     
     # Relationships
     run = relationship("ResearchRun", back_populates="framework_results")
+    
+    # Per-run results, optionally narrowed to one framework
+    __table_args__ = (
+        Index("idx_framework_results_run_id_framework_type", "run_id", "framework_type"),
+    )
 
 class CostTracking(Base):
     """Individual API call cost tracking"""
@@ -97,6 +111,17 @@ class CostTracking(Base):
     
     # Relationships
     run = relationship("ResearchRun", back_populates="cost_entries")
+    
+    # Composite indexes so run timelines and recent-entry listings are
+    # served in index order instead of filtered and then sorted; the NOCASE
+    # index serves case-insensitive model name prefix (LIKE 'x%') filters;
+    # (timestamp, cost) covers CostTracker's usage rollup
+    __table_args__ = (
+        Index("idx_cost_tracking_run_id_timestamp", "run_id", "timestamp"),
+        Index("idx_cost_tracking_timestamp_run_id", "timestamp", "run_id"),
+        Index("idx_cost_tracking_model_name_nocase", model_name.collate("NOCASE")),
+        Index("idx_cost_tracking_timestamp_cost", "timestamp", "cost"),
+    )
 
 class CompetitorProfile(Base):
     """Discovered competitor profiles"""
@@ -132,6 +157,14 @@ class ActivityLog(Base):
     
     # Relationships
     run = relationship("ResearchRun", back_populates="activity_logs")
+    
+    # Per-run logs in time order (optionally for one component) and recent
+    # activity across runs
+    __table_args__ = (
+        Index("idx_activity_logs_run_id_timestamp", "run_id", "timestamp"),
+        Index("idx_activity_logs_run_id_component_timestamp", "run_id", "component", "timestamp"),
+        Index("idx_activity_logs_timestamp", "timestamp"),
+    )
 
 class UserSettings(Base):
     """User configuration and preferences"""
@@ -158,6 +191,17 @@ class WatchlistSource(Base):
     description = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class RunStatsDaily(Base):
+    """Per-day, per-status rollup of research runs for the statistics endpoint"""
+    __tablename__ = "run_stats_daily"
+    
+    day = Column(Date, primary_key=True)  # Day the runs were created (UTC)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    timed_count = Column(Integer, nullable=False, default=0)  # Runs with a recorded duration
+    total_duration = Column(Float, nullable=False, default=0.0)
+    timed_cost = Column(Float, nullable=False, default=0.0)  # Cost of runs with a recorded duration
+
 # Pydantic models for API serialization
 class AgentCreate(BaseModel):
     id: str
@@ -194,6 +238,7 @@ class ResearchRunResponse(BaseModel):
     duration_seconds: Optional[float]
     total_cost: float
     created_at: datetime
+    completed_frameworks: Optional[int] = None  # Set by run listings
     
     class Config:
         from_attributes = True
@@ -228,18 +273,121 @@ class CostTrackingResponse(BaseModel):
         from_attributes = True
 
 # Database utility functions
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def to_async_url(database_url: str) -> str:
+    """Map a sync database URL onto its async driver (sqlite -> aiosqlite, postgresql -> asyncpg)"""
+    scheme, sep, rest = database_url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+def _run_stats_select(*where):
+    """research_runs grouped into run_stats_daily rows"""
+    day = func.date(ResearchRun.created_at)
+    timed = ResearchRun.duration_seconds.isnot(None)
+    return select(
+        day,
+        ResearchRun.status,
+        func.count(ResearchRun.id),
+        func.count(ResearchRun.duration_seconds),
+        func.coalesce(func.sum(ResearchRun.duration_seconds), 0.0),
+        func.coalesce(func.sum(case((timed, func.coalesce(ResearchRun.total_cost, 0.0)), else_=0.0)), 0.0)
+    ).where(*where).group_by(day, ResearchRun.status)
+
+_RUN_STATS_COLUMNS = ["day", "status", "count", "timed_count", "total_duration", "timed_cost"]
+
+def refresh_run_stats(session: Session, run: "ResearchRun"):
+    """
+    Recompute the run_stats_daily rows for the day a run was created.
+    Call after changing a run's status, before committing; recomputing
+    (rather than incrementing) keeps repeated calls harmless.
+    """
+    session.flush()
+    day = run.created_at.date()
+    day_start = datetime.combine(day, datetime.min.time())
+    session.execute(delete(RunStatsDaily).where(RunStatsDaily.day == day))
+    session.execute(insert(RunStatsDaily).from_select(_RUN_STATS_COLUMNS, _run_stats_select(
+        ResearchRun.created_at >= day_start,
+        ResearchRun.created_at < day_start + timedelta(days=1)
+    )))
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers run alongside the writer; NORMAL sync is safe under WAL"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    # Keep sort/group temp tables in memory and read the file through mmap
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
 class DatabaseManager:
     """Database connection and session management"""
     
     def __init__(self, database_url: str = "sqlite:///ai_research_platform.db"):
         self.database_url = database_url
-        self.engine = create_engine(database_url, echo=False)
+        self.engine = create_engine(database_url, echo=False, **self._pool_kwargs())
+        self._configure_engine(self.engine)
+        # expire_on_commit=False so objects stay readable after commit
+        # without a re-SELECT per attribute
+        self._sessionmaker = sessionmaker(self.engine, expire_on_commit=False)
+        self._async_engine: Optional[AsyncEngine] = None
+        self._async_sessionmaker: Optional[async_sessionmaker] = None
+        self._initialized = False
+    
+    def _pool_kwargs(self) -> Dict[str, Any]:
+        """Pool sizing shared by the sync and async engines"""
+        if ":memory:" in self.database_url:
+            # In-memory SQLite lives in a single connection; keep the default pool
+            return {}
+        return {
+            "pool_size": 20,
+            "max_overflow": 10,
+            "pool_pre_ping": True,
+            # Recycle before server-side idle timeouts drop connections, and
+            # fail fast instead of queueing requests when the pool is exhausted
+            "pool_recycle": 3600,
+            "pool_timeout": 10,
+        }
+    
+    def _configure_engine(self, engine):
+        """Apply per-connection settings for file-backed SQLite"""
+        if engine.dialect.name == "sqlite" and ":memory:" not in self.database_url:
+            event.listen(engine, "connect", _set_sqlite_pragmas)
+    
+    @property
+    def async_engine(self) -> AsyncEngine:
+        """Async engine for the same database, created on first use"""
+        if self._async_engine is None:
+            pool_kwargs = self._pool_kwargs()
+            if pool_kwargs:
+                # aiosqlite defaults to NullPool; ask for a real pool explicitly
+                pool_kwargs["poolclass"] = AsyncAdaptedQueuePool
+            self._async_engine = create_async_engine(
+                to_async_url(self.database_url), echo=False, **pool_kwargs
+            )
+            self._configure_engine(self._async_engine.sync_engine)
+        return self._async_engine
+    
+    def initialize(self):
+        """Create tables and default data; called once from app/worker startup"""
+        if self._initialized:
+            return
         self._create_tables()
         self._initialize_default_data()
+        self._backfill_run_stats()
+        self._initialized = True
     
     def _create_tables(self):
         """Create all tables"""
         Base.metadata.create_all(self.engine)
+        # create_all only adds indexes alongside new tables; add any that an
+        # existing database is missing
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(self.engine, checkfirst=True)
     
     def _initialize_default_data(self):
         """Initialize default data if tables are empty"""
@@ -277,21 +425,63 @@ class DatabaseManager:
                 }, "Framework analysis time allocation weights")
             ]
             
-            for key, value, desc in default_settings:
-                existing = session.query(UserSettings).filter_by(setting_key=key).first()
-                if not existing:
-                    setting = UserSettings(
-                        setting_key=key,
-                        setting_value=value,
-                        description=desc
-                    )
-                    session.add(setting)
+            # One lookup for all keys, then insert the missing ones together
+            existing = {
+                key for (key,) in session.query(UserSettings.setting_key).filter(
+                    UserSettings.setting_key.in_([key for key, _, _ in default_settings])
+                )
+            }
+            session.add_all([
+                UserSettings(setting_key=key, setting_value=value, description=desc)
+                for key, value, desc in default_settings
+                if key not in existing
+            ])
             
             session.commit()
     
+    def _backfill_run_stats(self):
+        """Build the run statistics rollup for databases that predate it"""
+        with Session(self.engine) as session:
+            if session.query(RunStatsDaily.day).first() is not None:
+                return
+            if session.query(ResearchRun.id).first() is None:
+                return
+            session.execute(insert(RunStatsDaily).from_select(_RUN_STATS_COLUMNS, _run_stats_select()))
+            session.commit()
+    
     def get_session(self) -> Session:
         """Get database session"""
-        return Session(self.engine)
+        return self._sessionmaker()
+    
+    def get_async_session(self) -> AsyncSession:
+        """Get async database session (use with `async with`)"""
+        if self._async_sessionmaker is None:
+            self._async_sessionmaker = async_sessionmaker(self.async_engine, expire_on_commit=False)
+        return self._async_sessionmaker()
+    
+    def warm_pool(self, connections: int = 5):
+        """Open and ping pooled sync connections ahead of the first request"""
+        opened = []
+        try:
+            for _ in range(connections):
+                conn = self.engine.connect()
+                opened.append(conn)
+                conn.execute(text("SELECT 1"))
+        finally:
+            for conn in opened:
+                conn.close()
+    
+    async def warm_async_pool(self, connections: int = 5):
+        """Open and ping pooled async connections ahead of the first request"""
+        async def ping():
+            async with self.async_engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        await asyncio.gather(*(ping() for _ in range(connections)))
+    
+    async def aclose(self):
+        """Close async database connections"""
+        if self._async_engine is not None:
+            await self._async_engine.dispose()
     
     def close(self):
         """Close database connection"""
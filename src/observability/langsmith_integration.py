@@ -4,188 +4,347 @@ Provides real-time monitoring of AI research workflows.
 """
 
 import os
+import importlib.util
 import json
 import asyncio
+import time
+import random
+import threading
 from typing import Dict, List, Optional, Any, Callable
 from datetime import datetime
-from functools import wraps
+from functools import wraps, cached_property, lru_cache
 from contextlib import asynccontextmanager
 
-try:
-    from langsmith import Client, traceable, trace
-    from langsmith.run_helpers import get_current_run_tree
-    LANGSMITH_AVAILABLE = True
-except ImportError:
-    LANGSMITH_AVAILABLE = False
-    # Create dummy decorators if langsmith not available
-    def traceable(name: str = None, **kwargs):
-        def decorator(func):
-            return func
-        return decorator
-    
-    def trace(name: str = None, **kwargs):
-        @asynccontextmanager
-        async def dummy_trace(**trace_kwargs):
-            yield type('DummyRun', (), {'id': 'dummy'})()
-        return dummy_trace(**kwargs)
+# Only checks that langsmith is installed; it is imported by trackers that
+# are actually enabled (see LangSmithTracker._import_langsmith)
+LANGSMITH_AVAILABLE = importlib.util.find_spec("langsmith") is not None
 
+import orjson
 import structlog
 from src.config import get_settings
 
 logger = structlog.get_logger(__name__)
 
+# (monotonic timestamp, ISO-8601 UTC string) of the last formatted time;
+# bursts of trace calls within a millisecond share one formatted timestamp
+_iso_cache = (float("-inf"), "")
+
+def _now_iso() -> str:
+    """Current UTC time in ISO-8601, formatted at most once per millisecond"""
+    global _iso_cache
+    now = time.monotonic()
+    if now - _iso_cache[0] >= 0.001:
+        _iso_cache = (now, datetime.utcnow().isoformat())
+    return _iso_cache[1]
+
+def _now_ms() -> int:
+    """Current Unix time in integer milliseconds, for metric payloads"""
+    return time.time_ns() // 1_000_000
+
+def _approx_size(obj: Any, budget: int = 4096) -> int:
+    """
+    Rough character size of a nested result: lengths of string keys and
+    leaves, str() of other scalars. Stops walking at `budget`, so large
+    payloads cost at most that much instead of a full str() of the tree.
+    """
+    size = 0
+    stack = [obj]
+    while stack and size < budget:
+        item = stack.pop()
+        if isinstance(item, str):
+            size += len(item)
+        elif isinstance(item, dict):
+            for key, value in item.items():
+                size += len(key) if isinstance(key, str) else 1
+                stack.append(value)
+        elif isinstance(item, (list, tuple, set)):
+            stack.extend(item)
+        else:
+            size += len(str(item))
+    return min(size, budget)
+
+def _summarize_porters(results: Dict[str, Any], summary: Dict[str, Any]):
+    if "forces" in results:
+        summary["forces_analyzed"] = len(results["forces"])
+
+def _summarize_pestel(results: Dict[str, Any], summary: Dict[str, Any]):
+    if "factors" in results:
+        summary["factors_analyzed"] = len(results["factors"])
+
+def _summarize_swot(results: Dict[str, Any], summary: Dict[str, Any]):
+    for category in ("strengths", "weaknesses", "opportunities", "threats"):
+        if category in results:
+            value = results[category]
+            summary[f"{category}_count"] = len(value) if isinstance(value, list) else 1
+
+# Framework-specific additions to the framework_results summary
+_FRAMEWORK_SUMMARIZERS = {
+    "porters": _summarize_porters,
+    "pestel": _summarize_pestel,
+    "swot": _summarize_swot,
+}
+
+class _DummyRun:
+    """Stand-in run yielded by the trace context managers when tracing is off"""
+    __slots__ = ("id",)
+    
+    def __init__(self, run_id: str):
+        self.id = run_id
+
+class _NoopTrace:
+    """Async context manager yielding a dummy run; reusable, allocation-free"""
+    __slots__ = ("run",)
+    
+    def __init__(self, run: _DummyRun):
+        self.run = run
+    
+    async def __aenter__(self) -> _DummyRun:
+        return self.run
+    
+    async def __aexit__(self, *exc_info) -> bool:
+        return False
+
+# Shared by the disabled trace context managers that don't carry a run id
+_DISABLED_TRACE = _NoopTrace(_DummyRun("dummy"))
+
+def _identity(func):
+    return func
+
+def _passthrough_decorator(**kwargs):
+    """Stand-in for traceable when tracing is off; leaves functions unchanged"""
+    return _identity
+
 class LangSmithTracker:
     """
     LangSmith integration for comprehensive workflow observability
     """
     
+    # Pending run tree updates; further updates are dropped (and counted)
+    # rather than blocking the caller
+    UPDATE_QUEUE_SIZE = 10_000
+    # Updates are applied in batches of up to this many, collected over this
+    # many seconds, with one merged update() per run tree
+    UPDATE_BATCH_SIZE = 32
+    UPDATE_BATCH_WINDOW = 0.02
+    # Values whose JSON encoding reaches this size are replaced by a
+    # truncation marker; LangSmith rejects ingest batches past ~24MB,
+    # dropping every trace in them
+    MAX_VALUE_BYTES = 8_000_000
+    # Custom metrics kept per run; the least recently updated are evicted
+    MAX_CUSTOM_METRICS = 256
+    # Seconds a health check result is reused; the health refresher polls
+    # more often than that, and each check is a list_runs request
+    HEALTH_CHECK_TTL = 30.0
+    
+    # Fixed key order for the metric payloads, zipped with each call's values
+    _QUALITY_KEYS = ("framework", "quality_score", "citations_count", "confidence_score", "ts_ms")
+    _PERF_KEYS = ("phase", "duration_seconds", "tokens_used", "api_calls_count", "tokens_per_second", "ts_ms")
+    _RESULT_KEYS = ("framework", "component", "result_keys", "result_size", "ts_ms")
+    
     def __init__(self):
         self.settings = get_settings()
-        self.client = None
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # Updates queued or in the drain task's current batch
+        self._pending_updates = 0
+        self.dropped_updates = 0
+        self._health_cache: Optional[tuple] = None
+        # Share of high-volume metric updates (performance, custom) forwarded;
+        # framework results and run status are always sent
+        self._sample_rate = self.settings.langsmith_sample_rate
         self.project_name = self.settings.langchain_project or "ai-research-platform"
         self.enabled = LANGSMITH_AVAILABLE and bool(self.settings.langchain_api_key)
         
         if self.enabled:
-            self._initialize_client()
+            self._import_langsmith()
+        if self.enabled:
+            self._configure_environment()
         else:
             logger.warning("LangSmith not available or not configured")
+        
+        # Decorator factory, picked once: LangSmith's traceable, or a
+        # pass-through when tracing is off
+        self._decorate = self._traceable if self.enabled else _passthrough_decorator
+        # Decorators per span name; the same few framework, phase and call
+        # names are requested over and over, so build each one once
+        self._decorator_for = lru_cache(maxsize=128)(
+            lambda name: self._decorate(name=name, project_name=self.project_name)
+        )
+    
+    def _import_langsmith(self):
+        """Import the LangSmith SDK pieces the tracker uses (enabled trackers only)"""
+        try:
+            from langsmith import Client, traceable, trace
+            from langsmith.run_helpers import get_current_run_tree
+        except Exception as e:
+            logger.error("Failed to import LangSmith", error=str(e))
+            self.enabled = False
+            return
+        self._client_factory = Client
+        self._traceable = traceable
+        self._trace = trace
+        self._get_current_run_tree = get_current_run_tree
+    
+    def _configure_environment(self):
+        """Point LangSmith's tracing (used by traceable) at this project"""
+        env = {
+            "LANGCHAIN_TRACING_V2": "true",
+            "LANGCHAIN_ENDPOINT": "https://api.smith.langchain.com",
+            "LANGCHAIN_API_KEY": self.settings.langchain_api_key,
+            "LANGCHAIN_PROJECT": self.project_name,
+        }
+        # Each os.environ write is a putenv; skip the ones already in place
+        for key, value in env.items():
+            if os.environ.get(key) != value:
+                os.environ[key] = value
+    
+    @property
+    def client(self):
+        """
+        LangSmith API client, constructed on first use so importing this
+        module (and the global tracker) stays cheap for code that never
+        queries LangSmith. None when disabled or construction failed.
+        """
+        if self._client is None and self.enabled:
+            with self._client_lock:
+                if self._client is None and self.enabled:
+                    self._initialize_client()
+        return self._client
     
     def _initialize_client(self):
         """Initialize LangSmith client"""
         try:
-            # Set environment variables for LangSmith
-            os.environ["LANGCHAIN_TRACING_V2"] = "true"
-            os.environ["LANGCHAIN_ENDPOINT"] = "https://api.smith.langchain.com"
-            os.environ["LANGCHAIN_API_KEY"] = self.settings.langchain_api_key
-            os.environ["LANGCHAIN_PROJECT"] = self.project_name
-            
-            self.client = Client()
-            logger.info("LangSmith client initialized", project=self.project_name)
+            self._client = self._client_factory()
+            self.log.info("LangSmith client initialized")
         except Exception as e:
-            logger.error("Failed to initialize LangSmith client", error=str(e))
+            self.log.error("Failed to initialize LangSmith client", error=str(e))
             self.enabled = False
     
+    @cached_property
+    def log(self):
+        """
+        Logger bound with the tracker's context, for the runtime (drain,
+        statistics, health) paths. Bound on first use rather than in __init__:
+        the global tracker is built at import, before the app configures
+        structlog, and binding resolves the logger configuration for good.
+        """
+        return logger.bind(component="langsmith", project=self.project_name)
+    
     def research_workflow(self, name: str = "research_workflow"):
         """Decorator for tracking research workflows"""
-        if not self.enabled:
-            def dummy_decorator(func):
-                return func
-            return dummy_decorator
-        
-        return traceable(name=name, project_name=self.project_name)
+        return self._decorator_for(name)
     
     def framework_analysis(self, framework_name: str):
         """Decorator for tracking framework analysis (Porter's, PESTEL, etc.)"""
-        if not self.enabled:
-            def dummy_decorator(func):
-                return func
-            return dummy_decorator
-        
-        return traceable(name=f"{framework_name}_analysis", project_name=self.project_name)
+        return self._decorator_for(f"{framework_name}_analysis")
     
     def research_phase(self, phase_name: str):
         """Decorator for tracking research phases"""
-        if not self.enabled:
-            def dummy_decorator(func):
-                return func
-            return dummy_decorator
-        
-        return traceable(name=f"phase_{phase_name}", project_name=self.project_name)
+        return self._decorator_for(f"phase_{phase_name}")
     
     def api_call_tracker(self, call_type: str):
         """Decorator for tracking API calls"""
-        if not self.enabled:
-            def dummy_decorator(func):
-                return func
-            return dummy_decorator
-        
-        return traceable(name=f"api_call_{call_type}", project_name=self.project_name)
+        return self._decorator_for(f"api_call_{call_type}")
     
-    @asynccontextmanager
-    async def trace_research_run(self, run_id: str, config: Dict[str, Any]):
+    def trace_research_run(self, run_id: str, config: Dict[str, Any]):
         """Context manager for tracing entire research runs"""
         if not self.enabled:
-            yield type('DummyRun', (), {'id': run_id})()
-            return
-        
-        async with trace(
+            return _NoopTrace(_DummyRun(run_id))
+        return self._trace_research_run(run_id, config)
+    
+    @asynccontextmanager
+    async def _trace_research_run(self, run_id: str, config: Dict[str, Any]):
+        async with self._trace(
             name="research_run",
             inputs={
                 "run_id": run_id,
                 "config": config,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": _now_iso()
             },
             project_name=self.project_name
         ) as run:
+            update = getattr(run, "update", None)
             try:
-                yield run
+                try:
+                    yield run
+                finally:
+                    # Updates logged inside the block are still queued; apply
+                    # them before the run is ended and sent
+                    await self._flush_updates()
             except Exception as e:
-                if hasattr(run, 'update'):
-                    run.update(
+                if update:
+                    update(
                         outputs={"error": str(e)},
                         extra={"status": "failed", "error_type": type(e).__name__}
                     )
                 raise
             else:
-                if hasattr(run, 'update'):
-                    run.update(
-                        extra={"status": "completed", "completed_at": datetime.utcnow().isoformat()}
+                if update:
+                    update(
+                        extra={"status": "completed", "completed_at": _now_iso()}
                     )
     
-    @asynccontextmanager 
-    async def trace_competitor_discovery(self, component: str, expected_count: int = 3):
+    def trace_competitor_discovery(self, component: str, expected_count: int = 3):
         """Context manager for tracing competitor discovery"""
         if not self.enabled:
-            yield type('DummyRun', (), {'id': 'dummy'})()
-            return
-        
-        async with trace(
+            return _DISABLED_TRACE
+        return self._trace_competitor_discovery(component, expected_count)
+    
+    @asynccontextmanager
+    async def _trace_competitor_discovery(self, component: str, expected_count: int):
+        async with self._trace(
             name="competitor_discovery",
             inputs={
                 "component": component,
                 "expected_competitors": expected_count,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": _now_iso()
             },
             project_name=self.project_name
         ) as run:
-            yield run
+            try:
+                yield run
+            finally:
+                await self._flush_updates()
     
-    @asynccontextmanager
-    async def trace_framework_execution(self, framework: str, components: List[str]):
+    def trace_framework_execution(self, framework: str, components: List[str]):
         """Context manager for tracing framework analysis execution"""
         if not self.enabled:
-            yield type('DummyRun', (), {'id': 'dummy'})()
-            return
-        
-        async with trace(
+            return _DISABLED_TRACE
+        return self._trace_framework_execution(framework, components)
+    
+    @asynccontextmanager
+    async def _trace_framework_execution(self, framework: str, components: List[str]):
+        async with self._trace(
             name=f"{framework}_framework",
             inputs={
                 "framework": framework,
                 "components": components,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": _now_iso()
             },
             project_name=self.project_name
         ) as run:
-            yield run
+            try:
+                yield run
+            finally:
+                await self._flush_updates()
     
     async def log_cost_metrics(self, run_id: str, cost_data: Dict[str, Any]):
         """Log cost metrics to LangSmith"""
         if not self.enabled:
             return
         
-        try:
-            # Get current run if available
-            current_run = get_current_run_tree()
-            if current_run:
-                current_run.update(
-                    extra={
-                        "cost_tracking": cost_data,
-                        "run_id": run_id,
-                        "cost_timestamp": datetime.utcnow().isoformat()
-                    }
-                )
-        except Exception as e:
-            logger.error("Failed to log cost metrics to LangSmith", error=str(e))
+        self._submit(self._build_cost_metrics, run_id, cost_data, _now_ms())
+    
+    def _build_cost_metrics(self, run_id: str, cost_data: Dict[str, Any], ts_ms: int):
+        return {
+            "extra": {
+                "cost_tracking": cost_data,
+                "run_id": run_id,
+                "cost_ts_ms": ts_ms
+            }
+        }
     
     async def log_research_quality(self, 
                                   framework: str, 
@@ -196,22 +355,13 @@ class LangSmithTracker:
         if not self.enabled:
             return
         
-        try:
-            current_run = get_current_run_tree()
-            if current_run:
-                current_run.update(
-                    extra={
-                        "quality_metrics": {
-                            "framework": framework,
-                            "quality_score": quality_score,
-                            "citations_count": citations_count,
-                            "confidence_score": confidence_score,
-                            "timestamp": datetime.utcnow().isoformat()
-                        }
-                    }
-                )
-        except Exception as e:
-            logger.error("Failed to log quality metrics", error=str(e))
+        self._submit(self._build_research_quality, framework, quality_score,
+                     citations_count, confidence_score, _now_ms())
+    
+    def _build_research_quality(self, framework: str, quality_score: float,
+                                citations_count: int, confidence_score: float, ts_ms: int):
+        values = (framework, quality_score, citations_count, confidence_score, ts_ms)
+        return {"extra": {"quality_metrics": dict(zip(self._QUALITY_KEYS, values))}}
     
     async def log_performance_metrics(self, 
                                     phase: str,
@@ -219,26 +369,18 @@ class LangSmithTracker:
                                     tokens_used: int,
                                     api_calls_count: int):
         """Log performance metrics for analysis phases"""
-        if not self.enabled:
+        if not self.enabled or not self._should_sample():
             return
         
-        try:
-            current_run = get_current_run_tree()
-            if current_run:
-                current_run.update(
-                    extra={
-                        "performance_metrics": {
-                            "phase": phase,
-                            "duration_seconds": duration_seconds,
-                            "tokens_used": tokens_used,
-                            "api_calls_count": api_calls_count,
-                            "tokens_per_second": tokens_used / duration_seconds if duration_seconds > 0 else 0,
-                            "timestamp": datetime.utcnow().isoformat()
-                        }
-                    }
-                )
-        except Exception as e:
-            logger.error("Failed to log performance metrics", error=str(e))
+        self._submit(self._build_performance_metrics, phase, duration_seconds,
+                     tokens_used, api_calls_count, _now_ms())
+    
+    def _build_performance_metrics(self, phase: str, duration_seconds: float,
+                                   tokens_used: int, api_calls_count: int, ts_ms: int):
+        # A zero duration short-circuits to 0 instead of dividing
+        values = (phase, duration_seconds, tokens_used, api_calls_count,
+                  duration_seconds and tokens_used / duration_seconds, ts_ms)
+        return {"extra": {"performance_metrics": dict(zip(self._PERF_KEYS, values))}}
     
     async def log_framework_results(self, 
                                   framework: str,
@@ -248,64 +390,201 @@ class LangSmithTracker:
         if not self.enabled:
             return
         
-        try:
-            current_run = get_current_run_tree()
-            if current_run:
-                # Extract key metrics for logging (avoid logging full results due to size)
-                result_summary = {
-                    "framework": framework,
-                    "component": component,
-                    "result_keys": list(results.keys()) if isinstance(results, dict) else [],
-                    "result_size": len(str(results)),
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-                
-                # Add framework-specific metrics
-                if framework == "porters":
-                    if "forces" in results:
-                        result_summary["forces_analyzed"] = len(results["forces"])
-                elif framework == "pestel":
-                    if "factors" in results:
-                        result_summary["factors_analyzed"] = len(results["factors"])
-                elif framework == "swot":
-                    swot_counts = {}
-                    for category in ["strengths", "weaknesses", "opportunities", "threats"]:
-                        if category in results:
-                            swot_counts[f"{category}_count"] = len(results[category]) if isinstance(results[category], list) else 1
-                    result_summary.update(swot_counts)
-                
-                current_run.update(
-                    outputs={"framework_results": result_summary}
-                )
-        except Exception as e:
-            logger.error("Failed to log framework results", error=str(e))
+        self._submit(self._build_framework_results, framework, results, component,
+                     _now_ms())
+    
+    def _build_framework_results(self, framework: str, results: Dict[str, Any],
+                                 component: Optional[str], ts_ms: int):
+        # Extract key metrics for logging (avoid logging full results due to size)
+        values = (framework, component,
+                  tuple(results) if isinstance(results, dict) else (),
+                  _approx_size(results), ts_ms)
+        result_summary = dict(zip(self._RESULT_KEYS, values))
+        
+        # Add framework-specific metrics
+        summarize = _FRAMEWORK_SUMMARIZERS.get(framework)
+        if summarize and isinstance(results, dict):
+            summarize(results, result_summary)
+        
+        return {"outputs": {"framework_results": result_summary}}
     
     async def create_custom_metric(self, 
                                  metric_name: str, 
                                  value: Any,
                                  langsmith_metadata: Optional[Dict[str, Any]] = None):
         """Create custom metric in current trace"""
-        if not self.enabled:
+        if not self.enabled or not self._should_sample():
             return
         
-        try:
-            current_run = get_current_run_tree()
-            if current_run:
-                custom_metrics = current_run.extra.get("custom_metrics", {})
-                custom_metrics[metric_name] = {
-                    "value": value,
-                    "metadata": langsmith_metadata or {},
-                    "timestamp": datetime.utcnow().isoformat()
-                }
-                
-                current_run.update(
-                    extra={
-                        **current_run.extra,
-                        "custom_metrics": custom_metrics
+        self._submit(self._build_custom_metric, metric_name, value, langsmith_metadata,
+                     _now_ms())
+    
+    def _build_custom_metric(self, metric_name: str, value: Any,
+                             langsmith_metadata: Optional[Dict[str, Any]], ts_ms: int):
+        # Merged with the run's existing custom metrics when applied
+        return {
+            "extra": {
+                "custom_metrics": {
+                    metric_name: {
+                        "value": value,
+                        "metadata": langsmith_metadata or {},
+                        "ts_ms": ts_ms
                     }
-                )
-        except Exception as e:
-            logger.error("Failed to create custom metric", error=str(e))
+                }
+            }
+        }
+    
+    def _should_sample(self) -> bool:
+        """Head-based sampling gate for high-volume metric updates"""
+        return self._sample_rate >= 1.0 or random.random() < self._sample_rate
+    
+    def _submit(self, build: Callable[..., Dict[str, Dict[str, Any]]], *args):
+        """
+        Queue a run tree update for the background drain task. The current
+        run tree is resolved here, since it lives in the caller's context;
+        build(*args) makes the update's payload later, off the caller's path.
+        """
+        current_run = self._get_current_run_tree()
+        if not current_run:
+            return
+        
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((build, current_run, args))
+        except asyncio.QueueFull:
+            self.dropped_updates += 1
+            return
+        self._pending_updates += 1
+    
+    async def _flush_updates(self):
+        """
+        Apply every update queued so far, including the drain task's current
+        batch, so none lands on a run tree after its trace has been sent
+        """
+        if not self._pending_updates or self._worker is None or self._worker.done():
+            return
+        applied = asyncio.get_running_loop().create_future()
+        await self._queue.put(applied)
+        await applied
+    
+    def _ensure_worker(self):
+        """Start the drain task (and its queue) on the running loop if it isn't running"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue(maxsize=self.UPDATE_QUEUE_SIZE)
+            self._worker = asyncio.create_task(self._drain())
+    
+    async def _drain(self):
+        """
+        Apply queued run tree updates until aclose() sends the sentinel.
+        Updates arriving within a short window are batched, so each run
+        gets one merged update() per batch; a _flush_updates() marker ends
+        the batch early and is resolved once it is applied.
+        """
+        while True:
+            item = await self._queue.get()
+            batch = []
+            waiters = []
+            closing = item is None
+            while not closing:
+                if isinstance(item, asyncio.Future):
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.UPDATE_BATCH_SIZE:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), self.UPDATE_BATCH_WINDOW)
+                except asyncio.TimeoutError:
+                    break
+                closing = item is None
+            
+            self._apply_batch(batch)
+            self._pending_updates -= len(batch)
+            if closing:
+                # Release flushes queued behind the sentinel; nothing will
+                # apply their updates now
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if isinstance(item, asyncio.Future):
+                        waiters.append(item)
+                self._pending_updates = 0
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+            if closing:
+                return
+    
+    def _apply_batch(self, batch: List[tuple]):
+        """Merge a batch of updates per run (later values win) and apply them"""
+        merged: Dict[int, tuple] = {}
+        for build, current_run, args in batch:
+            try:
+                update = build(*args)
+            except Exception as e:
+                self.log.error("Failed to build LangSmith update", update=build.__name__, error=str(e))
+                continue
+            fields = merged.setdefault(id(current_run), (current_run, {}))[1]
+            for field, values in update.items():
+                target = fields.setdefault(field, {})
+                # Payloads are built fresh per update, so merging in place is safe
+                metrics = values.pop("custom_metrics", None)
+                target.update(values)
+                if metrics:
+                    target.setdefault("custom_metrics", {}).update(metrics)
+        
+        for current_run, fields in merged.values():
+            try:
+                for values in fields.values():
+                    self._truncate_oversized(values)
+                extra = fields.get("extra")
+                if extra:
+                    # Fold the delta into the run's own extra in place; custom
+                    # metrics accumulate in its one custom_metrics dict rather
+                    # than being copied along with every earlier metric
+                    run_extra = current_run.extra
+                    metrics = extra.pop("custom_metrics", None)
+                    run_extra.update(extra)
+                    if metrics:
+                        self._accumulate_metrics(run_extra.setdefault("custom_metrics", {}), metrics)
+                    fields["extra"] = run_extra
+                current_run.update(**fields)
+            except Exception as e:
+                self.log.error("Failed to update LangSmith run", error=str(e))
+    
+    def _truncate_oversized(self, values: Dict[str, Any]):
+        """Replace (in place) values too large to ingest with a size marker"""
+        for key, value in values.items():
+            if key == "custom_metrics":
+                self._truncate_oversized(value)
+                continue
+            size = len(orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS))
+            if size >= self.MAX_VALUE_BYTES:
+                values[key] = {"_truncated": True, "bytes": size}
+    
+    def _accumulate_metrics(self, accumulated: Dict[str, Any], metrics: Dict[str, Any]):
+        """Add custom metrics to a run's set, evicting the least recently updated"""
+        for name, metric in metrics.items():
+            accumulated.pop(name, None)
+            accumulated[name] = metric
+        while len(accumulated) > self.MAX_CUSTOM_METRICS:
+            del accumulated[next(iter(accumulated))]
+    
+    async def aclose(self):
+        """Apply the updates still queued and stop the drain task"""
+        if self._worker is None or self._worker.done():
+            return
+        await self._queue.put(None)
+        await self._worker
+    
+    async def __aenter__(self):
+        """Start the drain task up front; leaving the block flushes it via aclose()"""
+        if self.enabled:
+            self._ensure_worker()
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+        return False
     
     async def get_run_statistics(self, days: int = 7) -> Dict[str, Any]:
         """Get statistics from LangSmith for the past N days"""
@@ -314,26 +593,14 @@ class LangSmithTracker:
         
         try:
             # Get runs from the past N days
-            from datetime import datetime, timedelta
+            from datetime import timedelta
             since = datetime.now() - timedelta(days=days)
             
-            runs = list(self.client.list_runs(
-                project_name=self.project_name,
-                start_time=since
-            ))
-            
-            # Analyze runs
-            total_runs = len(runs)
-            successful_runs = sum(1 for run in runs if run.status == "success")
-            failed_runs = sum(1 for run in runs if run.status == "error")
-            
-            # Calculate average duration
-            durations = [
-                (run.end_time - run.start_time).total_seconds() 
-                for run in runs 
-                if run.end_time and run.start_time
-            ]
-            avg_duration = sum(durations) / len(durations) if durations else 0
+            # list_runs pages over blocking HTTP, so reduce it off the loop
+            total_runs, successful_runs, failed_runs, total_duration, timed_runs = (
+                await asyncio.to_thread(self._reduce_runs, since)
+            )
+            avg_duration = total_duration / timed_runs if timed_runs else 0
             
             return {
                 "period_days": days,
@@ -345,24 +612,53 @@ class LangSmithTracker:
                 "project_name": self.project_name
             }
         except Exception as e:
-            logger.error("Failed to get run statistics", error=str(e))
+            self.log.error("Failed to get run statistics", error=str(e))
             return {"error": str(e)}
     
+    def _reduce_runs(self, since: datetime):
+        """
+        Count and time the project's runs since `since` in one pass as they
+        stream in, rather than holding the whole window in memory. Blocking.
+        """
+        total_runs = successful_runs = failed_runs = timed_runs = 0
+        total_duration = 0.0
+        for run in self.client.list_runs(
+            project_name=self.project_name,
+            start_time=since
+        ):
+            total_runs += 1
+            if run.status == "success":
+                successful_runs += 1
+            elif run.status == "error":
+                failed_runs += 1
+            if run.end_time and run.start_time:
+                total_duration += (run.end_time - run.start_time).total_seconds()
+                timed_runs += 1
+        return total_runs, successful_runs, failed_runs, total_duration, timed_runs
+    
     async def health_check(self) -> bool:
-        """Check if LangSmith is properly configured and accessible"""
+        """Check if LangSmith is properly configured and accessible (cached for HEALTH_CHECK_TTL)"""
         if not self.enabled:
             return False
         
+        now = time.monotonic()
+        if self._health_cache and now - self._health_cache[0] < self.HEALTH_CHECK_TTL:
+            return self._health_cache[1]
+        
+        healthy = False
         try:
             # Try to access the project
             if self.client:
                 # Simple test to verify connection
-                list(self.client.list_runs(project_name=self.project_name, limit=1))
-                return True
+                await asyncio.to_thread(
+                    lambda: list(self.client.list_runs(project_name=self.project_name, limit=1))
+                )
+                healthy = True
         except Exception as e:
-            logger.error("LangSmith health check failed", error=str(e))
+            self.log.error("LangSmith health check failed", error=str(e))
         
-        return False
+        self._health_cache = (now, healthy)
+        return healthy
 
 # Global instance
 langsmith_tracker = LangSmithTracker()
@@ -5,14 +5,51 @@ Provides real-time cost monitoring with soft/hard caps and alerts.
 
 import asyncio
 import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
-from pydantic import BaseModel
+from typing import Dict, List, Optional, Any, Tuple, Callable
+from dataclasses import dataclass, field
+import orjson
 import structlog
 
 logger = structlog.get_logger(__name__)
 
+# (monotonic expiry, month start, day start) for the budget windows
+_period_cache: Optional[tuple] = None
+
+def _budget_periods() -> tuple:
+    """
+    Start of the current UTC month and day, recomputed only when the day
+    rolls over (cost timestamps are stored as naive UTC)
+    """
+    global _period_cache
+    now = time.monotonic()
+    if _period_cache and now < _period_cache[0]:
+        return _period_cache[1], _period_cache[2]
+    
+    utc_now = datetime.utcnow()
+    day_start = utc_now.replace(hour=0, minute=0, second=0, microsecond=0)
+    month_start = day_start.replace(day=1)
+    seconds_left = (day_start + timedelta(days=1) - utc_now).total_seconds()
+    _period_cache = (now + seconds_left, month_start, day_start)
+    return month_start, day_start
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    """
+    Open a cost database connection with the per-connection tuning: NORMAL
+    sync (safe under WAL), in-memory temp tables, a 64MB page cache and
+    mmap'd reads. WAL itself is persistent and set once in _init_database.
+    """
+    # Opened once per CostTracker and used from the event loop; the check is
+    # relaxed so it can still be closed from whichever thread shuts down
+    conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=256)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")
+    conn.execute("PRAGMA mmap_size=268435456")
+    return conn
+
 @dataclass
 class BudgetConfig:
     """Budget configuration with multiple limits"""
@@ -22,10 +59,9 @@ class BudgetConfig:
     per_run_hard_cap: float = 3.00
     daily_soft_cap: float = 2.00
 
-class CostEntry(BaseModel):
+@dataclass(slots=True)
+class CostEntry:
     """Individual cost tracking entry"""
-    id: Optional[int] = None
-    run_id: Optional[str] = None
     model_name: str
     input_tokens: int
     output_tokens: int
@@ -33,9 +69,12 @@ class CostEntry(BaseModel):
     call_type: str
     duration_seconds: float
     timestamp: datetime
-    metadata: Dict[str, Any] = {}
+    run_id: Optional[str] = None
+    id: Optional[int] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
 
-class BudgetStatus(BaseModel):
+@dataclass(slots=True)
+class BudgetStatus:
     """Current budget status and usage"""
     monthly_usage: float
     monthly_limit: float
@@ -46,25 +85,249 @@ class BudgetStatus(BaseModel):
     current_run_cost: float
     run_limit: float
     can_continue: bool
-    warnings: List[str] = []
-    recommendations: List[str] = []
+    warnings: List[str] = field(default_factory=list)
+    recommendations: List[str] = field(default_factory=list)
+
+def _resolve(waiters: List[asyncio.Future]):
+    """Wake flush() callers waiting on a batch"""
+    for waiter in waiters:
+        if not waiter.done():
+            waiter.set_result(None)
+
+class CostTrackerBatcher:
+    """
+    Buffers cost rows in an asyncio.Queue and writes them to SQLite from a
+    background task, one executemany() transaction per batch, run on the
+    tracker's database thread
+    """
+    
+    INSERT_SQL = """
+        INSERT INTO cost_tracking 
+        (run_id, model_name, input_tokens, output_tokens, total_tokens, cost, 
+         call_type, duration_seconds, timestamp, call_metadata)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    # Seconds between passive WAL checkpoints after a write
+    CHECKPOINT_INTERVAL = 900.0
+    
+    def __init__(self, conn: sqlite3.Connection, executor: ThreadPoolExecutor,
+                 batch_size: int = 40, flush_interval: float = 0.5):
+        self.conn = conn
+        self.executor = executor
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._last_checkpoint = time.monotonic()
+        # Cost of rows queued or being written, not yet visible in the table
+        self.pending_cost = 0.0
+    
+    def start(self):
+        """Start the background writer if it is not already running"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+    
+    def enqueue(self, row: tuple):
+        """Queue a row for insertion without waiting on the database"""
+        self.queue.put_nowait(row)
+        self.pending_cost += row[5]
+        self.start()
+    
+    async def run(self):
+        """
+        Collect up to batch_size rows or wait flush_interval, then write them,
+        until stop() queues the None sentinel. A flush() marker ends the
+        current batch early and is resolved once that batch is written.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            batch = []
+            waiters = []
+            closing = False
+            if isinstance(item, asyncio.Future):
+                waiters.append(item)
+            else:
+                batch.append(item)
+                deadline = loop.time() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    if item is None:
+                        closing = True
+                        break
+                    if isinstance(item, asyncio.Future):
+                        waiters.append(item)
+                        break
+                    batch.append(item)
+            try:
+                await self._write_batch(batch)
+            finally:
+                _resolve(waiters)
+            if closing:
+                return
+    
+    async def flush(self):
+        """
+        Write every row queued so far, including a batch the writer is
+        already holding, before returning
+        """
+        if self._task is not None and not self._task.done():
+            # Go through the writer so rows it has already taken off the
+            # queue are written first; stop() drains the marker if the
+            # writer exits before reaching it
+            written = asyncio.get_running_loop().create_future()
+            self.queue.put_nowait(written)
+            await written
+            return
+        
+        rows = []
+        waiters = []
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if isinstance(item, asyncio.Future):
+                waiters.append(item)
+            elif item is not None:
+                rows.append(item)
+        try:
+            await self._write_batch(rows)
+        finally:
+            _resolve(waiters)
+    
+    async def stop(self):
+        """Stop the background writer and flush remaining rows"""
+        # A sentinel rather than cancel(): wait_for can swallow a cancellation
+        # that races with a queue get, leaving the writer running
+        if self._task is not None and not self._task.done():
+            self.queue.put_nowait(None)
+            await self._task
+        self._task = None
+        await self.flush()
+    
+    async def _write_batch(self, rows: List[tuple]):
+        """
+        Write rows on the database thread. pending_cost is only ever changed
+        here on the event loop, so enqueue() and a finishing write can't
+        lose each other's update
+        """
+        if not rows:
+            return
+        batch_cost = sum(row[5] for row in rows)
+        try:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self._write, rows, batch_cost)
+        finally:
+            self.pending_cost -= batch_cost
+    
+    def _write(self, rows: List[tuple], batch_cost: float):
+        """Insert rows in a single transaction. Blocking; runs on the database thread"""
+        try:
+            with self.conn:
+                self.conn.executemany(self.INSERT_SQL, rows)
+            # Auto-checkpoints only run when a commit crosses the page
+            # threshold; a periodic passive one keeps the WAL from growing
+            # through quiet stretches
+            now = time.monotonic()
+            if now - self._last_checkpoint >= self.CHECKPOINT_INTERVAL:
+                self.conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+                self._last_checkpoint = now
+            logger.info("Cost entries stored",
+                       count=len(rows),
+                       cost=batch_cost)
+        except Exception as e:
+            logger.error("Failed to store cost entries", error=str(e), count=len(rows))
 
 class CostTracker:
     """
     Comprehensive cost tracking with budget enforcement and alerting
     """
     
+    # Seconds the monthly/daily usage rollup is reused before re-querying
+    USAGE_CACHE_TTL = 15.0
+    # Daily usage may run this far past the daily soft cap before calls stop
+    DAILY_CAP_BUFFER = 1.5
+    # PRAGMA user_version of a database whose stored data is up to date
+    SCHEMA_VERSION = 1
+    
+    # Hot queries are kept as constants so the connection's statement cache
+    # hands back the already-prepared statement instead of re-planning
+    USAGE_SQL = """
+        SELECT COALESCE(SUM(cost), 0),
+               COALESCE(SUM(CASE WHEN timestamp >= ? THEN cost END), 0)
+        FROM cost_tracking 
+        WHERE timestamp >= ?
+    """
+    
+    BY_MODEL_SQL = """
+        SELECT model_name, 
+               SUM(calls) as calls, 
+               SUM(cost) as total_cost,
+               SUM(input_tokens) as input_tokens,
+               SUM(output_tokens) as output_tokens
+        FROM cost_daily_summary 
+        WHERE date >= ?
+        GROUP BY model_name
+        ORDER BY total_cost DESC
+    """
+    
+    BY_CALL_TYPE_SQL = """
+        SELECT call_type, 
+               SUM(calls) as calls,
+               SUM(cost) as total_cost,
+               SUM(cost) / SUM(calls) as avg_cost
+        FROM cost_daily_summary 
+        WHERE date >= ?
+        GROUP BY call_type
+        ORDER BY total_cost DESC
+    """
+    
+    DAILY_USAGE_SQL = """
+        SELECT date,
+               SUM(cost) as daily_cost,
+               SUM(calls) as daily_calls,
+               MIN(first_call) as first_call,
+               MAX(last_call) as last_call
+        FROM cost_daily_summary 
+        WHERE date >= ?
+        GROUP BY date
+        ORDER BY date DESC
+    """
+    
     def __init__(self, budget_config: Optional[BudgetConfig] = None, db_path: str = "ai_research_platform.db"):
-        self.budget = budget_config or BudgetConfig()
+        self._set_budget(budget_config or BudgetConfig())
         self.db_path = db_path
         self.current_run_id: Optional[str] = None
         self.current_run_cost: float = 0.0
+        # One connection for the tracker's lifetime, shared with the batcher.
+        # Queries and batch writes run on a single dedicated thread, so a
+        # slow commit or checkpoint never stalls the event loop and
+        # statements on the connection never interleave
+        self._conn = _connect(db_path)
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cost-db")
+        self.batcher = CostTrackerBatcher(self._conn, self._db_executor)
+        
+        # (monotonic timestamp, monthly usage, daily usage, day start) of the
+        # last rollup, kept current by track_api_call between refreshes
+        self._usage_cache: Optional[tuple] = None
+        self._usage_lock = asyncio.Lock()
         self._init_database()
     
     def _init_database(self):
         """Initialize cost tracking tables if they don't exist"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._conn as conn:
+                # WAL lets budget and breakdown reads run alongside the batch
+                # writer; the mode persists in the database file
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA wal_autocheckpoint=1000")
+                
                 # Check if cost_tracking table exists, if not create it
                 cursor = conn.cursor()
                 cursor.execute("""
@@ -74,11 +337,14 @@ class CostTracker:
                         model_name TEXT NOT NULL,
                         input_tokens INTEGER NOT NULL,
                         output_tokens INTEGER NOT NULL,
+                        total_tokens INTEGER NOT NULL,
                         cost REAL NOT NULL,
                         call_type TEXT NOT NULL,
                         duration_seconds REAL,
-                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                        metadata TEXT
+                        success BOOLEAN,
+                        error_message TEXT,
+                        call_metadata JSON,
+                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
                     )
                 """)
                 
@@ -91,12 +357,121 @@ class CostTracker:
                     CREATE INDEX IF NOT EXISTS idx_cost_tracking_run_id 
                     ON cost_tracking(run_id)
                 """)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_cost_tracking_run_id_timestamp 
+                    ON cost_tracking(run_id, timestamp)
+                """)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_cost_tracking_timestamp_run_id 
+                    ON cost_tracking(timestamp, run_id)
+                """)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_cost_tracking_model_name_nocase 
+                    ON cost_tracking(model_name COLLATE NOCASE)
+                """)
+                # Covering index for the usage SUMs
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_cost_tracking_timestamp_cost 
+                    ON cost_tracking(timestamp, cost)
+                """)
+                self._init_daily_summary(cursor)
+                self._migrate_timestamp_format(cursor)
+                # The planner only prefers the covering index once it has
+                # statistics; gather them the first time, after which
+                # PRAGMA optimize on close keeps them current
+                cursor.execute("SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'")
+                if cursor.fetchone() is None:
+                    cursor.execute("ANALYZE cost_tracking")
                 conn.commit()
                 logger.info("Cost tracking database initialized")
         except Exception as e:
             logger.error("Failed to initialize cost tracking database", error=str(e))
             raise
     
+    def _init_daily_summary(self, cursor: sqlite3.Cursor):
+        """
+        Create the per-day, per-model, per-call-type cost rollup behind
+        get_cost_breakdown. A trigger keeps it current on every insert into
+        cost_tracking (whichever process writes it); databases that predate
+        it are backfilled once.
+        """
+        cursor.execute("SELECT name FROM sqlite_master WHERE name = 'cost_daily_summary'")
+        if cursor.fetchone() is not None:
+            return
+        
+        # Table, trigger and backfill in one transaction, so no insert is
+        # both missed by the trigger and by the backfill
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS cost_daily_summary (
+                date TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                call_type TEXT NOT NULL,
+                calls INTEGER NOT NULL,
+                cost REAL NOT NULL,
+                input_tokens INTEGER NOT NULL,
+                output_tokens INTEGER NOT NULL,
+                first_call TEXT,
+                last_call TEXT,
+                PRIMARY KEY (date, model_name, call_type)
+            )
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_cost_daily_summary 
+            AFTER INSERT ON cost_tracking
+            BEGIN
+                INSERT INTO cost_daily_summary 
+                (date, model_name, call_type, calls, cost, input_tokens, output_tokens, first_call, last_call)
+                VALUES (DATE(NEW.timestamp), NEW.model_name, NEW.call_type, 1, NEW.cost,
+                        NEW.input_tokens, NEW.output_tokens, NEW.timestamp, NEW.timestamp)
+                ON CONFLICT (date, model_name, call_type) DO UPDATE SET
+                    calls = calls + 1,
+                    cost = cost + excluded.cost,
+                    input_tokens = input_tokens + excluded.input_tokens,
+                    output_tokens = output_tokens + excluded.output_tokens,
+                    first_call = MIN(first_call, excluded.first_call),
+                    last_call = MAX(last_call, excluded.last_call);
+            END
+        """)
+        cursor.execute("""
+            INSERT INTO cost_daily_summary 
+            (date, model_name, call_type, calls, cost, input_tokens, output_tokens, first_call, last_call)
+            SELECT DATE(timestamp), model_name, call_type, COUNT(*), SUM(cost),
+                   SUM(input_tokens), SUM(output_tokens), MIN(timestamp), MAX(timestamp)
+            FROM cost_tracking
+            GROUP BY DATE(timestamp), model_name, call_type
+        """)
+    
+    def _migrate_timestamp_format(self, cursor: sqlite3.Cursor):
+        """
+        Rewrite timestamps stored by earlier versions ('T' separator, no
+        fraction on whole seconds) into the form SQLAlchemy binds, so text
+        comparisons against ORM parameters order correctly. Runs once per
+        database, tracked by PRAGMA user_version.
+        """
+        cursor.execute("PRAGMA user_version")
+        if cursor.fetchone()[0] >= self.SCHEMA_VERSION:
+            return
+        
+        cursor.execute("""
+            UPDATE cost_tracking 
+            SET timestamp = REPLACE(timestamp, 'T', ' ') ||
+                            CASE WHEN length(timestamp) = 19 THEN '.000000' ELSE '' END
+            WHERE timestamp LIKE '____-__-__T%'
+        """)
+        cursor.execute("""
+            UPDATE cost_daily_summary 
+            SET first_call = REPLACE(first_call, 'T', ' '),
+                last_call = REPLACE(last_call, 'T', ' ')
+            WHERE first_call LIKE '____-__-__T%' OR last_call LIKE '____-__-__T%'
+        """)
+        cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+    
+    def _set_budget(self, budget: BudgetConfig):
+        """Apply a budget and the limits derived from it"""
+        self.budget = budget
+        self._daily_hard_cap = budget.daily_soft_cap * self.DAILY_CAP_BUFFER
+    
     async def start_run(self, run_id: str) -> bool:
         """
         Start tracking costs for a new run
@@ -107,14 +482,24 @@ class CostTracker:
         Returns:
             True if run can start, False if budget constraints prevent it
         """
-        # Check if we can start a new run
+        _, started = await self.check_and_start_run(run_id)
+        return started
+    
+    async def check_run_budget(self, run_id: str) -> Tuple[BudgetStatus, bool]:
+        """
+        Decide whether a new run fits the budget, without starting cost
+        tracking for it (runs queued for another process are checked here)
+        
+        Returns:
+            The budget status the decision was based on, and whether the run may start
+        """
         status = await self.get_budget_status()
         
         if not status.can_continue:
             logger.warning("Cannot start run due to budget constraints", 
                           run_id=run_id,
                           warnings=status.warnings)
-            return False
+            return status, False
         
         # Check if estimated run cost would exceed limits
         estimated_run_cost = self.budget.per_run_soft_cap
@@ -123,17 +508,31 @@ class CostTracker:
                           run_id=run_id,
                           estimated_cost=estimated_run_cost,
                           remaining=status.monthly_remaining)
-            return False
+            return status, False
+        
+        return status, True
+    
+    async def check_and_start_run(self, run_id: str) -> Tuple[BudgetStatus, bool]:
+        """
+        Start tracking costs for a new run from a single budget check
+        
+        Returns:
+            The budget status the decision was based on, and whether the run started
+        """
+        status, allowed = await self.check_run_budget(run_id)
+        if not allowed:
+            return status, False
         
         self.current_run_id = run_id
         self.current_run_cost = 0.0
+        self._invalidate_usage_cache()
         
         logger.info("Started cost tracking for run", 
                    run_id=run_id,
                    monthly_usage=status.monthly_usage,
                    monthly_remaining=status.monthly_remaining)
         
-        return True
+        return status, True
     
     async def track_api_call(self,
                            model: str,
@@ -167,16 +566,21 @@ class CostTracker:
         # Update current run cost
         self.current_run_cost += cost
         
+        # Keep the cached rollup in step with calls tracked since it was taken
+        if self._usage_cache:
+            cached_at, monthly_usage, daily_usage, day_start = self._usage_cache
+            self._usage_cache = (cached_at, monthly_usage + cost, daily_usage + cost, day_start)
+        
         # Check budget constraints
         status = await self.get_budget_status()
         
-        # Log the API call
-        logger.info("API call tracked",
-                   model=model,
-                   cost=cost,
-                   run_cost=self.current_run_cost,
-                   monthly_usage=status.monthly_usage,
-                   call_type=call_type)
+        # Per-call detail is debug only; the batcher logs an aggregate per write
+        logger.debug("API call tracked",
+                    model=model,
+                    cost=cost,
+                    run_cost=self.current_run_cost,
+                    monthly_usage=status.monthly_usage,
+                    call_type=call_type)
         
         # Check for warnings
         if status.warnings:
@@ -193,30 +597,23 @@ class CostTracker:
         }
     
     async def _store_cost_entry(self, entry: CostEntry):
-        """Store cost entry in database"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO cost_tracking 
-                    (run_id, model_name, input_tokens, output_tokens, cost, 
-                     call_type, duration_seconds, timestamp, metadata)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    entry.run_id,
-                    entry.model_name,
-                    entry.input_tokens,
-                    entry.output_tokens,
-                    entry.cost,
-                    entry.call_type,
-                    entry.duration_seconds,
-                    entry.timestamp.isoformat(),
-                    str(entry.metadata) if entry.metadata else None
-                ))
-                conn.commit()
-        except Exception as e:
-            logger.error("Failed to store cost entry", error=str(e), entry=entry)
-            raise
+        """Queue cost entry for the background batch writer"""
+        self.batcher.enqueue((
+            entry.run_id,
+            entry.model_name,
+            entry.input_tokens,
+            entry.output_tokens,
+            entry.input_tokens + entry.output_tokens,
+            entry.cost,
+            entry.call_type,
+            entry.duration_seconds,
+            # Same text form SQLAlchemy binds DateTime parameters in (space
+            # separator, always microseconds), so ORM range filters and the
+            # /tracking before_ts cursor compare correctly against it
+            entry.timestamp.isoformat(sep=" ", timespec="microseconds"),
+            # JSON text, so the CostTracking model's JSON column can read it back
+            orjson.dumps(entry.metadata, default=str).decode() if entry.metadata else None
+        ))
     
     async def can_make_call(self, estimated_cost: float) -> bool:
         """
@@ -228,49 +625,78 @@ class CostTracker:
         Returns:
             True if call can be made, False otherwise
         """
-        status = await self.get_budget_status()
-        
-        # Check hard caps first
-        if status.monthly_usage + estimated_cost > self.budget.monthly_hard_cap:
-            return False
-        
-        if self.current_run_cost + estimated_cost > self.budget.per_run_hard_cap:
-            return False
-        
-        # Check daily cap
-        if status.daily_usage + estimated_cost > self.budget.daily_soft_cap * 1.5:  # 50% buffer on daily
-            return False
-        
-        return True
+        # Only the usage rollup is needed here, not the warnings and
+        # recommendations get_budget_status() formats for the dashboard
+        monthly_usage, daily_usage = await self._get_usage()
+        
+        return (
+            monthly_usage + estimated_cost <= self.budget.monthly_hard_cap and
+            self.current_run_cost + estimated_cost <= self.budget.per_run_hard_cap and
+            daily_usage + estimated_cost <= self._daily_hard_cap
+        )
+    
+    def _cached_usage(self, day_start: datetime) -> Optional[tuple]:
+        """The cached rollup, if it is fresh and from the current day"""
+        cache = self._usage_cache
+        if cache and cache[3] == day_start and time.monotonic() - cache[0] < self.USAGE_CACHE_TTL:
+            return cache[1], cache[2]
+        return None
+    
+    async def _get_usage(self) -> tuple:
+        """
+        Monthly and daily usage, served from the in-memory rollup. It is
+        re-queried every USAGE_CACHE_TTL (to pick up other processes' spend)
+        and as soon as the day rolls over.
+        """
+        month_start, day_start = _budget_periods()
+        usage = self._cached_usage(day_start)
+        if usage:
+            return usage
+        
+        async with self._usage_lock:
+            # Another caller may have refreshed the rollup while we waited
+            usage = self._cached_usage(day_start)
+            if usage:
+                return usage
+            
+            try:
+                monthly_usage, daily_usage = await self._run_db(self._query_usage, month_start, day_start)
+            except Exception as e:
+                logger.error("Failed to get budget status", error=str(e))
+                # Don't cache a failed rollup
+                return 0.0, 0.0
+            
+            # Calls tracked here but still waiting on the batcher count too.
+            # The writer drops a batch from pending_cost on the loop as soon
+            # as its write returns, and the database thread runs writes and
+            # this query in order, so a batch is never missing from both
+            pending = self.batcher.pending_cost
+            monthly_usage += pending
+            daily_usage += pending
+            
+            self._usage_cache = (time.monotonic(), monthly_usage, daily_usage, day_start)
+            return monthly_usage, daily_usage
+    
+    def _query_usage(self, month_start: datetime, day_start: datetime) -> tuple:
+        """Monthly and daily usage from the table. Blocking; runs on the database thread"""
+        with self._conn as conn:
+            cursor = conn.cursor()
+            
+            # Monthly and daily usage in a single pass over this month's rows
+            cursor.execute(self.USAGE_SQL, (day_start.isoformat(sep=" "), month_start.isoformat(sep=" ")))
+            return cursor.fetchone()
+    
+    async def _run_db(self, func: Callable, *args):
+        """Run blocking database work on the tracker's database thread"""
+        return await asyncio.get_running_loop().run_in_executor(self._db_executor, func, *args)
+    
+    def _invalidate_usage_cache(self):
+        """Force the next budget check to re-query usage"""
+        self._usage_cache = None
     
     async def get_budget_status(self) -> BudgetStatus:
         """Get current budget status with usage statistics"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Get monthly usage
-                month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                cursor.execute("""
-                    SELECT COALESCE(SUM(cost), 0) 
-                    FROM cost_tracking 
-                    WHERE timestamp >= ?
-                """, (month_start.isoformat(),))
-                monthly_usage = cursor.fetchone()[0]
-                
-                # Get daily usage
-                day_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                cursor.execute("""
-                    SELECT COALESCE(SUM(cost), 0) 
-                    FROM cost_tracking 
-                    WHERE timestamp >= ?
-                """, (day_start.isoformat(),))
-                daily_usage = cursor.fetchone()[0]
-                
-        except Exception as e:
-            logger.error("Failed to get budget status", error=str(e))
-            monthly_usage = 0.0
-            daily_usage = 0.0
+        monthly_usage, daily_usage = await self._get_usage()
         
         monthly_remaining = self.budget.monthly_hard_cap - monthly_usage
         monthly_percentage = (monthly_usage / self.budget.monthly_hard_cap) * 100
@@ -279,7 +705,7 @@ class CostTracker:
         can_continue = (
             monthly_usage < self.budget.monthly_hard_cap and
             self.current_run_cost < self.budget.per_run_hard_cap and
-            daily_usage < self.budget.daily_soft_cap * 1.5
+            daily_usage < self._daily_hard_cap
         )
         
         # Generate warnings
@@ -329,106 +755,7 @@ class CostTracker:
             Dictionary with cost breakdown by model, call type, etc.
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                since_date = datetime.now() - timedelta(days=days)
-                
-                # Cost by model
-                cursor.execute("""
-                    SELECT model_name, 
-                           COUNT(*) as calls, 
-                           SUM(cost) as total_cost,
-                           SUM(input_tokens) as input_tokens,
-                           SUM(output_tokens) as output_tokens
-                    FROM cost_tracking 
-                    WHERE timestamp >= ?
-                    GROUP BY model_name
-                    ORDER BY total_cost DESC
-                """, (since_date.isoformat(),))
-                
-                by_model = [
-                    {
-                        "model": row[0],
-                        "calls": row[1],
-                        "cost": row[2],
-                        "input_tokens": row[3],
-                        "output_tokens": row[4],
-                        "avg_cost_per_call": row[2] / row[1] if row[1] > 0 else 0
-                    }
-                    for row in cursor.fetchall()
-                ]
-                
-                # Cost by call type
-                cursor.execute("""
-                    SELECT call_type, 
-                           COUNT(*) as calls,
-                           SUM(cost) as total_cost,
-                           AVG(cost) as avg_cost
-                    FROM cost_tracking 
-                    WHERE timestamp >= ?
-                    GROUP BY call_type
-                    ORDER BY total_cost DESC
-                """, (since_date.isoformat(),))
-                
-                by_call_type = [
-                    {
-                        "call_type": row[0],
-                        "calls": row[1],
-                        "cost": row[2],
-                        "avg_cost": row[3]
-                    }
-                    for row in cursor.fetchall()
-                ]
-                
-                # Daily usage
-                cursor.execute("""
-                    SELECT DATE(timestamp) as date,
-                           SUM(cost) as daily_cost,
-                           COUNT(*) as daily_calls
-                    FROM cost_tracking 
-                    WHERE timestamp >= ?
-                    GROUP BY DATE(timestamp)
-                    ORDER BY date DESC
-                """, (since_date.isoformat(),))
-                
-                daily_usage = [
-                    {
-                        "date": row[0],
-                        "cost": row[1],
-                        "calls": row[2]
-                    }
-                    for row in cursor.fetchall()
-                ]
-                
-                # Total statistics
-                cursor.execute("""
-                    SELECT COUNT(*) as total_calls,
-                           SUM(cost) as total_cost,
-                           AVG(cost) as avg_cost,
-                           MIN(timestamp) as first_call,
-                           MAX(timestamp) as last_call
-                    FROM cost_tracking 
-                    WHERE timestamp >= ?
-                """, (since_date.isoformat(),))
-                
-                stats = cursor.fetchone()
-                summary = {
-                    "total_calls": stats[0],
-                    "total_cost": stats[1] or 0.0,
-                    "avg_cost_per_call": stats[2] or 0.0,
-                    "first_call": stats[3],
-                    "last_call": stats[4],
-                    "period_days": days
-                }
-                
-                return {
-                    "summary": summary,
-                    "by_model": by_model,
-                    "by_call_type": by_call_type,
-                    "daily_usage": daily_usage
-                }
-                
+            return await self._run_db(self._query_cost_breakdown, days)
         except Exception as e:
             logger.error("Failed to get cost breakdown", error=str(e))
             return {
@@ -438,11 +765,84 @@ class CostTracker:
                 "daily_usage": []
             }
     
+    def _query_cost_breakdown(self, days: int) -> Dict[str, Any]:
+        """Cost breakdown from the daily rollup. Blocking; runs on the database thread"""
+        with self._conn as conn:
+            cursor = conn.cursor()
+            
+            # The rollup is per day, so the window starts at midnight
+            since_day = (datetime.utcnow() - timedelta(days=days)).date().isoformat()
+            
+            # Cost by model
+            cursor.execute(self.BY_MODEL_SQL, (since_day,))
+            
+            by_model = [
+                {
+                    "model": model,
+                    "calls": calls,
+                    "cost": cost,
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                    "avg_cost_per_call": cost / calls if calls > 0 else 0
+                }
+                for model, calls, cost, input_tokens, output_tokens in cursor
+            ]
+            
+            # Cost by call type
+            cursor.execute(self.BY_CALL_TYPE_SQL, (since_day,))
+            
+            by_call_type = [
+                {
+                    "call_type": call_type,
+                    "calls": calls,
+                    "cost": cost,
+                    "avg_cost": avg_cost
+                }
+                for call_type, calls, cost, avg_cost in cursor
+            ]
+            
+            # Daily usage; the summary totals are folded from these
+            # buckets rather than aggregating the window again
+            cursor.execute(self.DAILY_USAGE_SQL, (since_day,))
+            
+            daily_rows = cursor.fetchall()
+            daily_usage = [
+                {
+                    "date": date,
+                    "cost": cost,
+                    "calls": calls
+                }
+                for date, cost, calls, _, _ in daily_rows
+            ]
+            
+            # Total statistics
+            total_calls = sum(row[2] for row in daily_rows)
+            total_cost = sum((row[1] for row in daily_rows), 0.0)
+            summary = {
+                "total_calls": total_calls,
+                "total_cost": total_cost,
+                "avg_cost_per_call": total_cost / total_calls if total_calls else 0.0,
+                "first_call": daily_rows[-1][3] if daily_rows else None,
+                "last_call": daily_rows[0][4] if daily_rows else None,
+                "period_days": days
+            }
+            
+            return {
+                "summary": summary,
+                "by_model": by_model,
+                "by_call_type": by_call_type,
+                "daily_usage": daily_usage
+            }
+    
     async def end_run(self) -> Dict[str, Any]:
         """End the current run and return summary"""
         if not self.current_run_id:
             return {"error": "No active run"}
         
+        # Write the run's queued cost rows now, so they are durable and
+        # visible to run cost queries as soon as the run is reported done
+        await self.batcher.flush()
+        
         run_summary = {
             "run_id": self.current_run_id,
             "total_cost": self.current_run_cost,
@@ -462,16 +862,31 @@ class CostTracker:
         # Reset run tracking
         self.current_run_id = None
         self.current_run_cost = 0.0
+        self._invalidate_usage_cache()
         
         return run_summary
     
     async def update_budget(self, new_budget: BudgetConfig):
         """Update budget configuration"""
         old_budget = self.budget
-        self.budget = new_budget
+        self._set_budget(new_budget)
+        self._invalidate_usage_cache()
         
         logger.info("Budget configuration updated",
                    old_monthly_cap=old_budget.monthly_hard_cap,
                    new_monthly_cap=new_budget.monthly_hard_cap,
                    old_run_cap=old_budget.per_run_hard_cap,
-                   new_run_cap=new_budget.per_run_hard_cap)
\ No newline at end of file
+                   new_run_cap=new_budget.per_run_hard_cap)
+    
+    def close(self):
+        """Close the shared database connection; stop the batcher first"""
+        self._db_executor.submit(self._close_connection).result()
+        self._db_executor.shutdown()
+    
+    def _close_connection(self):
+        try:
+            # Refreshes planner statistics if this session's queries need it
+            self._conn.execute("PRAGMA optimize")
+        except Exception as e:
+            logger.warning("PRAGMA optimize failed", error=str(e))
+        self._conn.close()
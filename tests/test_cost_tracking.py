@@ -0,0 +1,150 @@
+"""
+Cost rows written by CostTracker, read back through SQLite and the /api/costs routes.
+"""
+
+import asyncio
+import sqlite3
+
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.responses import ORJSONResponse
+from fastapi.testclient import TestClient
+
+from src.api.deps import get_db
+from src.api.routes import costs
+from src.api.routes.costs import get_cost_tracking
+from src.db.models import DatabaseManager
+from src.observability.tracker import CostTracker
+
+
+def _track_calls(db_path: str, count: int):
+    """Record count calls through the batcher and wait for them to land"""
+    async def run():
+        tracker = CostTracker(db_path=db_path)
+        for i in range(count):
+            await tracker.track_api_call("openai/gpt-4o-mini", 10, 5, 0.01, f"call_{i}")
+        await tracker.batcher.stop()
+        tracker.close()
+
+    asyncio.run(run())
+
+
+def _page(session, before_ts=None, limit=2):
+    return asyncio.run(get_cost_tracking(
+        Response(), run_id=None, model=None, call_type=None, days=7, limit=limit,
+        before_ts=before_ts, stream=False, db=session
+    ))
+
+
+def test_before_ts_pages_through_tracker_rows(tmp_path):
+    db_path = str(tmp_path / "costs.db")
+    _track_calls(db_path, 5)
+    manager = DatabaseManager(f"sqlite:///{db_path}")
+
+    seen = []
+    with manager.get_session() as session:
+        page = _page(session)
+        while page:
+            seen.extend(row["id"] for row in page)
+            page = _page(session, before_ts=page[-1]["timestamp"])
+    manager.close()
+
+    assert seen == [5, 4, 3, 2, 1]
+
+
+@pytest.fixture
+def costs_client(tmp_path):
+    """The cost routes over a fresh database, with its path"""
+    db_path = str(tmp_path / "costs.db")
+    manager = DatabaseManager(f"sqlite:///{db_path}")
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(costs.router, prefix="/api")
+
+    def get_test_db():
+        session = manager.get_session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = get_test_db
+    with TestClient(app) as client:
+        yield client, db_path
+    manager.close()
+
+
+def test_cursor_headers_page_through_shared_timestamps(costs_client):
+    client, db_path = costs_client
+    _track_calls(db_path, 5)
+    # A batch written within one timestamp, as bursts of calls can be
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE cost_tracking SET timestamp = (SELECT MAX(timestamp) FROM cost_tracking)")
+
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = client.get("/api/costs/tracking", params=params)
+        assert response.status_code == 200
+        seen.extend(row["id"] for row in response.json())
+        if "X-Next-Before-Ts" not in response.headers:
+            break
+        params = {
+            "limit": 2,
+            "before_ts": response.headers["X-Next-Before-Ts"],
+            "before_id": response.headers["X-Next-Before-Id"],
+        }
+
+    assert seen == [5, 4, 3, 2, 1]
+
+
+def test_model_filter_treats_wildcards_literally(costs_client):
+    client, db_path = costs_client
+    _track_calls(db_path, 2)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE cost_tracking SET model_name = 'openai/gpt_4o' WHERE id = 2")
+
+    def ids(model):
+        response = client.get("/api/costs/tracking", params={"model": model})
+        assert response.status_code == 200
+        return [row["id"] for row in response.json()]
+
+    assert ids("openai/gpt_") == [2]
+    assert ids("%") == []
+    assert ids("openai/") == [2, 1]
+
+
+def test_legacy_timestamps_are_migrated(tmp_path):
+    db_path = str(tmp_path / "costs.db")
+    _track_calls(db_path, 1)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("PRAGMA user_version = 0")
+        conn.execute("UPDATE cost_tracking SET timestamp = '2026-01-02T03:04:05'")
+
+    CostTracker(db_path=db_path).close()
+
+    with sqlite3.connect(db_path) as conn:
+        stored = conn.execute("SELECT timestamp FROM cost_tracking").fetchone()[0]
+    assert stored == "2026-01-02 03:04:05.000000"
+
+
+def test_end_run_writes_rows_the_writer_is_holding(tmp_path):
+    db_path = str(tmp_path / "costs.db")
+
+    async def run():
+        tracker = CostTracker(db_path=db_path)
+        await tracker.start_run("run-1")
+        for i in range(3):
+            await tracker.track_api_call("openai/gpt-4o-mini", 10, 5, 0.01, f"call_{i}")
+            # Let the writer take the row into its batch
+            await asyncio.sleep(0)
+        await tracker.end_run()
+        with sqlite3.connect(db_path) as conn:
+            stored = conn.execute("SELECT COUNT(*) FROM cost_tracking WHERE run_id = 'run-1'").fetchone()[0]
+        pending = tracker.batcher.pending_cost
+        await asyncio.wait_for(tracker.batcher.stop(), 5)
+        tracker.close()
+        return stored, pending
+
+    stored, pending = asyncio.run(run())
+    assert stored == 3
+    assert pending == pytest.approx(0, abs=1e-12)
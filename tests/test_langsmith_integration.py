@@ -0,0 +1,114 @@
+"""
+Run tree updates queued by LangSmithTracker, applied against a fake run tree.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from src.observability.langsmith_integration import LangSmithTracker
+
+
+class FakeRunTree:
+    """Records update() calls the way a LangSmith RunTree would receive them"""
+
+    def __init__(self):
+        self.extra = {}
+        self.updates = []
+
+    def update(self, **fields):
+        self.updates.append(fields)
+
+
+def _tracker(run: FakeRunTree, exits=None) -> LangSmithTracker:
+    """An enabled tracker whose traces and current run tree are the fake"""
+    tracker = LangSmithTracker()
+    tracker.enabled = True
+    tracker._sample_rate = 1.0
+    tracker._get_current_run_tree = lambda: run
+
+    @asynccontextmanager
+    async def trace(**kwargs):
+        try:
+            yield run
+        finally:
+            # What the trace would send: the updates applied by now
+            exits.append(len(run.updates))
+
+    tracker._trace = trace
+    return tracker
+
+
+def test_updates_to_one_run_are_coalesced():
+    run = FakeRunTree()
+
+    async def main():
+        tracker = _tracker(run)
+        await tracker.log_cost_metrics("run-1", {"total_cost": 0.5})
+        await tracker.log_research_quality("swot", 0.9, 4, 0.8)
+        await tracker.log_framework_results("swot", {"strengths": ["a", "b"]})
+        await tracker.create_custom_metric("m1", 1)
+        await tracker.create_custom_metric("m2", 2)
+        await asyncio.wait_for(tracker.aclose(), 5)
+
+    asyncio.run(main())
+
+    assert len(run.updates) == 1
+    fields = run.updates[0]
+    assert fields["extra"]["cost_tracking"] == {"total_cost": 0.5}
+    assert fields["extra"]["quality_metrics"]["quality_score"] == 0.9
+    assert set(fields["extra"]["custom_metrics"]) == {"m1", "m2"}
+    assert fields["outputs"]["framework_results"]["strengths_count"] == 2
+
+
+def test_updates_are_applied_before_a_trace_exits():
+    run = FakeRunTree()
+    exits = []
+
+    async def main():
+        tracker = _tracker(run, exits)
+        # A flush must end the batch rather than wait out the window
+        tracker.UPDATE_BATCH_WINDOW = 30.0
+        async with tracker.trace_competitor_discovery("pricing"):
+            await tracker.log_cost_metrics("run-1", {"total_cost": 0.5})
+        await tracker.aclose()
+
+    asyncio.run(asyncio.wait_for(main(), 5))
+
+    assert exits == [1]
+
+
+def test_updates_past_the_queue_size_are_dropped_and_counted():
+    run = FakeRunTree()
+
+    async def main():
+        tracker = _tracker(run)
+        tracker.UPDATE_QUEUE_SIZE = 2
+        # No awaits in between, so the drain task can't make room
+        for i in range(5):
+            tracker._submit(tracker._build_custom_metric, f"m{i}", i, None, 0)
+        await asyncio.wait_for(tracker.aclose(), 5)
+        return tracker.dropped_updates
+
+    dropped = asyncio.run(main())
+
+    assert dropped == 3
+    assert set(run.extra["custom_metrics"]) == {"m0", "m1"}
+
+
+@pytest.mark.parametrize("close_first", [False, True])
+def test_flush_racing_aclose_does_not_hang(close_first):
+    run = FakeRunTree()
+
+    async def main():
+        tracker = _tracker(run)
+        await tracker.log_cost_metrics("run-1", {"total_cost": 0.5})
+        calls = [tracker._flush_updates(), tracker.aclose()]
+        if close_first:
+            calls.reverse()
+        await asyncio.wait_for(asyncio.gather(*calls), 5)
+
+    asyncio.run(main())
+
+    assert len(run.updates) == 1
@@ -0,0 +1,115 @@
+"""
+The run_stats_daily rollup, kept in step with research_runs by refresh_run_stats
+and built for older databases by the initialize() backfill.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from src.db.models import DatabaseManager, ResearchRun, RunStatsDaily, refresh_run_stats
+
+DAY_ONE = datetime(2026, 3, 1, 9, 0)
+DAY_TWO = datetime(2026, 3, 2, 15, 30)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'runs.db'}")
+    manager.initialize()
+    yield manager
+    manager.close()
+
+
+def _rollup(session):
+    rows = session.query(RunStatsDaily).all()
+    return {
+        (str(row.day), row.status): (row.count, row.timed_count, row.total_duration, row.timed_cost)
+        for row in rows
+    }
+
+
+def _aggregate(session):
+    """The rollup computed straight from research_runs"""
+    rows = session.execute(text(
+        "SELECT date(created_at), status, COUNT(*), COUNT(duration_seconds), "
+        "COALESCE(SUM(duration_seconds), 0.0), "
+        "COALESCE(SUM(CASE WHEN duration_seconds IS NOT NULL THEN COALESCE(total_cost, 0.0) ELSE 0.0 END), 0.0) "
+        "FROM research_runs GROUP BY date(created_at), status"
+    ))
+    return {(day, status): tuple(values) for day, status, *values in rows}
+
+
+def _create(session, created_at, name="run"):
+    """A pending run, as launch_research_run records it"""
+    run = ResearchRun(
+        id=str(uuid.uuid4()), agent_id="research-agent-v1", name=name, status="pending",
+        input_data={"components": ["pricing"]}, start_time=created_at, created_at=created_at
+    )
+    session.add(run)
+    refresh_run_stats(session, run)
+    session.commit()
+    return run
+
+
+def _finish(session, run, status, duration, cost=0.0):
+    """A terminal status, as the workflow and cancel route record it"""
+    run.status = status
+    run.end_time = run.start_time + timedelta(seconds=duration)
+    run.duration_seconds = duration
+    run.total_cost = cost
+    refresh_run_stats(session, run)
+    session.commit()
+
+
+def test_rollup_follows_run_lifecycle(manager):
+    with manager.get_session() as session:
+        completed = _create(session, DAY_ONE)
+        failed = _create(session, DAY_ONE)
+        cancelled = _create(session, DAY_TWO)
+        assert _rollup(session) == _aggregate(session)
+        assert _rollup(session)[("2026-03-01", "pending")][0] == 2
+
+        completed.status = "running"
+        refresh_run_stats(session, completed)
+        session.commit()
+        assert _rollup(session) == _aggregate(session)
+
+        _finish(session, completed, "completed", 120.0, cost=0.75)
+        _finish(session, failed, "failed", 30.0, cost=0.25)
+        _finish(session, cancelled, "cancelled", 10.0)
+        assert _rollup(session) == _aggregate(session)
+        assert ("2026-03-01", "pending") not in _rollup(session)
+
+        # A retry is a new run; the failed original keeps its row
+        _create(session, DAY_TWO, name=f"Retry of {failed.name}")
+        assert _rollup(session) == _aggregate(session)
+        assert _rollup(session)[("2026-03-01", "failed")] == (1, 1, 30.0, 0.25)
+        assert _rollup(session)[("2026-03-02", "pending")] == (1, 0, 0.0, 0.0)
+
+
+def test_backfill_matches_research_runs(tmp_path, manager):
+    with manager.get_session() as session:
+        for created_at, status, duration in [
+            (DAY_ONE, "completed", 60.0),
+            (DAY_ONE, "completed", 90.0),
+            (DAY_ONE, "failed", None),
+            (DAY_TWO, "cancelled", 5.0),
+            (DAY_TWO, "pending", None),
+        ]:
+            session.add(ResearchRun(
+                id=str(uuid.uuid4()), agent_id="research-agent-v1", name="run", status=status,
+                duration_seconds=duration, total_cost=0.5, created_at=created_at
+            ))
+        # A database from before the rollup existed
+        session.query(RunStatsDaily).delete()
+        session.commit()
+
+    backfilled = DatabaseManager(f"sqlite:///{tmp_path / 'runs.db'}")
+    backfilled.initialize()
+    with backfilled.get_session() as session:
+        assert _rollup(session) == _aggregate(session)
+        assert _rollup(session)[("2026-03-01", "completed")] == (2, 2, 150.0, 1.0)
+    backfilled.close()
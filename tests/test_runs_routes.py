@@ -0,0 +1,87 @@
+"""
+Research and run management routes over a fresh database, with the
+research workflow running in-process as it does without an arq queue.
+"""
+
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi.testclient import TestClient
+
+from src.api.deps import get_db
+from src.api.routes import research, runs
+from src.db.models import DatabaseManager, ResearchRun
+from src.observability.tracker import CostTracker
+
+
+@pytest.fixture
+def runs_client(tmp_path, monkeypatch):
+    """The research and run routes over a fresh database, with its manager"""
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'runs.db'}")
+    manager.initialize()
+    tracker = CostTracker(db_path=str(tmp_path / "costs.db"))
+    monkeypatch.setattr(research, "db_manager", manager)
+    monkeypatch.setattr(research, "cost_tracker", tracker)
+    # The simulated workflow sleeps between steps; don't wait those out
+    real_sleep = asyncio.sleep
+    monkeypatch.setattr(asyncio, "sleep", lambda delay, result=None: real_sleep(0, result))
+
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(research.router, prefix="/api")
+    app.include_router(runs.router, prefix="/api")
+
+    def get_test_db():
+        session = manager.get_session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = get_test_db
+    with TestClient(app) as client:
+        yield client, manager
+        client.portal.call(tracker.batcher.stop)
+    tracker.close()
+    manager.close()
+
+
+def test_retried_run_workflow_is_scheduled(runs_client):
+    client, manager = runs_client
+    with manager.get_session() as session:
+        session.add(ResearchRun(
+            id="failed-run", agent_id="research-agent-v1", name="Pricing", status="failed",
+            input_data={"components": ["pricing"], "positioning_doc": None, "config": None}
+        ))
+        session.commit()
+
+    response = client.post("/api/runs/failed-run/retry")
+    assert response.status_code == 200
+    new_run_id = response.json()["new_run_id"]
+
+    # TestClient runs the response's background tasks before returning
+    with manager.get_session() as session:
+        retried = session.get(ResearchRun, new_run_id)
+        assert retried.status == "completed"
+        assert session.get(ResearchRun, "failed-run").status == "failed"
+
+
+def test_queued_run_needs_the_per_run_soft_cap_remaining(runs_client):
+    client, manager = runs_client
+    enqueued = []
+
+    class FakePool:
+        async def enqueue_job(self, *args, **kwargs):
+            enqueued.append(args)
+
+    client.app.state.arq_pool = FakePool()
+    # Under the hard cap, but with less left than one run may spend
+    research.cost_tracker.budget.monthly_hard_cap = 1.0
+
+    response = client.post("/api/research/run", json={"name": "Pricing", "components": ["pricing"]})
+
+    assert response.status_code == 402
+    assert enqueued == []
+    with manager.get_session() as session:
+        assert session.query(ResearchRun).count() == 0